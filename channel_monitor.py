@@ -536,8 +536,8 @@ class ChannelMonitor:
                     self.trigger_news_processing(news_id)
                     self.processed_messages.add(message_id)
             else:
-                logger.error("Failed to save news to database.")
-                self.send_status_message("❌ Error saving to DB.")
+                logger.info(f"📋 News already in DB, skipping: {news_data.get('url')}")
+                self.send_status_message(f"📋 Already in DB: {news_data['title'][:40]}...")
 
         except Exception as e:
             logger.error(f"Failed to process message {message_id}: {e}", exc_info=True)
@@ -3,11 +3,15 @@ Registry for news source engines
 """
 
 from typing import Dict, List, Optional, Type
+from urllib.parse import urlsplit
 from .base import SourceEngine
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Сколько хостов помнить в кэше "хост -> движок"
+HOST_ENGINE_CACHE_SIZE = 1024
+
 
 class EngineRegistry:
     """
@@ -20,6 +24,8 @@ class EngineRegistry:
         """Инициализация реестра"""
         self.engines: Dict[str, Type[SourceEngine]] = {}
         self.engine_instances: Dict[str, SourceEngine] = {}
+        # Какой движок последним подошел для хоста - проверяется первым
+        self._host_engines: Dict[str, str] = {}
     
     def register_engine(self, name: str, engine_class: Type[SourceEngine]):
         """
@@ -66,9 +72,23 @@ class EngineRegistry:
         Returns:
             Подходящий движок или None
         """
-        # Сначала проверяем существующие экземпляры
+        try:
+            host = urlsplit(url).hostname or ''
+        except ValueError:
+            host = ''
+
+        # Ссылки обычно приходят с одних и тех же сайтов: сначала пробуем движок, уже выбранный для хоста
+        name = self._host_engines.get(host)
+        if name is not None:
+            engine = self.engine_instances.get(name)
+            if engine is not None and engine.can_handle(url):
+                logger.info(f"🎯 Выбран движок {name} для URL: {url[:50]}...")
+                return engine
+
+        # Затем проверяем существующие экземпляры
         for name, engine in self.engine_instances.items():
             if engine.can_handle(url):
+                self._remember_host_engine(host, name)
                 logger.info(f"🎯 Выбран движок {name} для URL: {url[:50]}...")
                 return engine
         
@@ -78,6 +98,7 @@ class EngineRegistry:
                 engine = engine_class(config)
                 if engine.can_handle(url):
                     self.engine_instances[name] = engine
+                    self._remember_host_engine(host, name)
                     logger.info(f"🎯 Создан и выбран движок {name} для URL: {url[:50]}...")
                     return engine
             except Exception as e:
@@ -87,6 +108,15 @@ class EngineRegistry:
         logger.warning(f"❌ Не найден подходящий движок для URL: {url[:50]}...")
         return None
     
+    def _remember_host_engine(self, host: str, name: str):
+        """Запоминает движок для хоста (кэш ограничен по размеру)"""
+        if not host:
+            return
+        if len(self._host_engines) >= HOST_ENGINE_CACHE_SIZE and host not in self._host_engines:
+            # Самая старая запись (dict сохраняет порядок вставки)
+            del self._host_engines[next(iter(self._host_engines))]
+        self._host_engines[host] = name
+    
     def get_available_engines(self) -> List[str]:
         """
         Возвращает список доступных движков
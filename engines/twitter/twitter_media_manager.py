@@ -452,7 +452,6 @@ class TwitterMediaManager(MediaManager):
             Путь к скачанному видео или None
         """
         try:
-            import subprocess
             import json
             from pathlib import Path
             
@@ -533,8 +532,10 @@ class TwitterMediaManager(MediaManager):
                 video_url
             ]
             
-            check_result = subprocess.run(check_cmd, capture_output=True, text=True, timeout=30)
+            check_result = self._run_process(check_cmd, timeout=30, text=True)
             
+            if check_result is None:
+                return None
             if check_result.returncode != 0:
                 logger.warning(f"⚠️ Видео недоступно: {check_result.stderr}")
                 return None
@@ -553,7 +554,9 @@ class TwitterMediaManager(MediaManager):
                 logger.warning("⚠️ Не удалось получить информацию о видео, пробуем загрузить...")
             
             # Запускаем yt-dlp с увеличенным таймаутом
-            result = subprocess.run(cmd, capture_output=True, text=True, timeout=120)
+            result = self._run_process(cmd, timeout=120, text=True)
+            if result is None:
+                return None
             
             # Проверяем, что файл скачался (включая .part файлы)
             final_path = output_path
@@ -5,28 +5,143 @@
 """
 
 import os
+import atexit
 import logging
+import random
+import re
+import time
 import hashlib
+import itertools
+import json
+import shutil
+import subprocess
+import threading
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from pathlib import Path
+from types import MappingProxyType
 from typing import Dict, List, Optional, Tuple
-from PIL import Image, ImageOps, ImageEnhance
+from PIL import Image, ImageOps, ImageEnhance, ImageFile
 import uuid
 import base64
 import io
-from urllib.parse import urlparse, urljoin
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FuturesTimeoutError
+from urllib.parse import urlparse, urljoin, unquote
+
+try:
+    import yt_dlp
+except ImportError:
+    yt_dlp = None
+
+try:
+    from curl_cffi import requests as cffi_requests
+except ImportError:
+    cffi_requests = None
+
+try:
+    from selenium import webdriver
+    from selenium.webdriver.chrome.options import Options as ChromeOptions
+except ImportError:
+    webdriver = None
 
 logger = logging.getLogger(__name__)
 
+# Размер блока при потоковой загрузке (кратен странице памяти, вмещает несколько TLS-записей)
+DOWNLOAD_CHUNK = 64 * 1024
+# Для видео (десятки МБ) важна пропускная способность - читаем крупными блоками
+VIDEO_DOWNLOAD_CHUNK = 1 << 20
+# Начиная с этого размера место под видео резервируется заранее одним экстентом
+PREALLOCATE_THRESHOLD = 8 << 20
+
+# Символы, удаляемые из заголовка в именах файлов: все, кроме букв и цифр (в т.ч. не-ASCII), пробела, '-' и '_'
+# (\w в str-шаблоне совпадает с str.isalnum() плюс '_')
+SAFE_TITLE_UNSAFE_RE = re.compile(r'[^\w -]')
+
+# Сколько изображений-кандидатов загружать одновременно
+MAX_PARALLEL_DOWNLOADS = 4
+
+# Настройки yt-dlp
+YTDLP_TIMEOUT = 60
+# Сколько ждать завершения процесса после SIGTERM, прежде чем послать SIGKILL
+PROCESS_TERMINATE_GRACE = 2
+# Профиль TLS ClientHello для curl_cffi: многие CDN блокируют по отпечатку TLS, а не по JS
+CFFI_IMPERSONATE = 'chrome120'
+# Манифест валидаторов HTTP-кэша в каталоге медиа (точка в начале - не удаляется очисткой)
+HTTP_CACHE_FILENAME = '.cache.json'
+# Общие заголовки запросов изображений; User-Agent подставляется по очереди из self.user_agents
+IMAGE_REQUEST_HEADERS = MappingProxyType({
+    'Accept': 'image/avif,image/webp,image/apng,image/svg+xml,image/*,*/*;q=0.8',
+    'Accept-Language': 'en-US,en;q=0.9,ru;q=0.8',
+    'Accept-Encoding': 'gzip, deflate',
+    'DNT': '1',
+    'Connection': 'keep-alive',
+    'Upgrade-Insecure-Requests': '1',
+    'Sec-Fetch-Dest': 'image',
+    'Sec-Fetch-Mode': 'no-cors',
+    'Sec-Fetch-Site': 'cross-site',
+    'Cache-Control': 'max-age=0'
+})
+# Параметр url= в ссылках POLITICO CDN (dims4/default/resize?...&url=<encoded>)
+POLITICO_URL_RE = re.compile(r'[?&]url=([^&]+)')
+YTDLP_USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+# Ключ ydl.params с дедлайном текущей загрузки (читается хуком прогресса)
+YTDLP_DEADLINE_PARAM = 'mediamanager_deadline'
+YTDLP_BASE_PARAMS = {
+    'format': 'best[ext=mp4]/best',  # Лучшее качество в mp4 или любое
+    'noplaylist': True,
+    'quiet': True,
+    'no_warnings': True,
+    'socket_timeout': YTDLP_TIMEOUT,
+    'http_headers': {'User-Agent': YTDLP_USER_AGENT},
+}
+
 class MediaManager:
     """Менеджер для работы с медиа-файлами"""
     
+    # Общий на процесс headless Chrome для fallback-загрузок: MediaManager создается на каждую
+    # новость, а браузер запускается один раз. Доступ к нему (и к WebDriver из движков) - под этой блокировкой
+    _shared_selenium_driver = None
+    _selenium_lock = threading.Lock()
+    
+    # Общий на процесс пул для загрузки изображений-кандидатов (потоки создаются по мере надобности);
+    # Selenium используется только под _selenium_lock
+    _download_executor = ThreadPoolExecutor(max_workers=MAX_PARALLEL_DOWNLOADS)
+    
+    # Манифест HTTP-кэша общий для всех экземпляров: запись идет под этой блокировкой
+    # с перечитыванием файла, чтобы не затереть записи других экземпляров
+    _http_cache_lock = threading.Lock()
+    
     def __init__(self, config: Dict):
         self.config = config
         self.media_dir = Path("resources/media/news")
         self.media_dir.mkdir(parents=True, exist_ok=True)
         self.selenium_driver = None  # Для передачи WebDriver из движков
         
+        # Валидаторы HTTP-кэша (ETag / Last-Modified) для уже скачанных видео
+        self._http_cache_path = self.media_dir / HTTP_CACHE_FILENAME
+        
+        # Общая HTTP-сессия: переиспользует TCP/TLS соединения к одним и тем же CDN.
+        # Адаптер повторяет только ответы 429/5xx; обрывы и таймауты повторяет _download_with_retry,
+        # Retry-After не соблюдается, чтобы не занимать пул загрузок неограниченным ожиданием
+        self.session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=16,
+            pool_maxsize=32,
+            max_retries=Retry(
+                total=3, connect=0, read=0, status=3, backoff_factor=0.5,
+                status_forcelist=[429, 502, 503, 504], respect_retry_after_header=False, raise_on_status=False
+            )
+        )
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        
+        # Экземпляр yt-dlp этого MediaManager (переиспользует экстракторы и соединения), блокировка
+        # его параметров и поток, в котором идут загрузки через него
+        self._ydl = None
+        self._ydl_lock = threading.Lock()
+        self._ydl_executor = ThreadPoolExecutor(max_workers=1)
+        
         # Инициализируем препроцессор видео
         try:
             from scripts.video_preprocessor import VideoPreprocessor
@@ -42,6 +157,7 @@ class MediaManager:
             'Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:121.0) Gecko/20100101 Firefox/121.0',
             'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/17.2 Safari/605.1.15'
         ]
+        self._ua_cycle = itertools.cycle(self.user_agents)
         
         # Поддерживаемые форматы
         self.supported_image_formats = {'.jpg', '.jpeg', '.png', '.webp'}
@@ -65,6 +181,91 @@ class MediaManager:
         """Устанавливает WebDriver для использования в загрузке изображений"""
         self.selenium_driver = driver
     
+    @classmethod
+    def close_shared_selenium_driver(cls):
+        """Закрывает общий WebDriver, если он был запущен (вызывается автоматически при выходе)"""
+        with cls._selenium_lock:
+            driver = cls._shared_selenium_driver
+            cls._shared_selenium_driver = None
+        if driver is None:
+            return
+        try:
+            driver.quit()
+        except Exception as e:
+            logger.debug(f"Ошибка закрытия WebDriver: {e}")
+    
+    @classmethod
+    def _get_shared_selenium_driver(cls):
+        """Возвращает общий headless Chrome, запуская его только один раз на процесс.
+
+        Вызывается под _selenium_lock.
+        """
+        if cls._shared_selenium_driver is None:
+            # Настройка Chrome для скрытой работы
+            chrome_options = ChromeOptions()
+            chrome_options.add_argument("--headless")
+            chrome_options.add_argument("--no-sandbox")
+            chrome_options.add_argument("--disable-dev-shm-usage")
+            chrome_options.add_argument("--disable-gpu")
+            chrome_options.add_argument("--disable-images")  # Парадоксально, но помогает избежать блокировок
+            chrome_options.add_argument("--user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36")
+            
+            cls._shared_selenium_driver = webdriver.Chrome(options=chrome_options)
+            logger.info("🌐 Запущен WebDriver для загрузки изображений")
+        return cls._shared_selenium_driver
+    
+    def _load_http_cache(self) -> Dict:
+        """Загружает манифест url -> {etag, last_modified, path, size}"""
+        try:
+            with open(self._http_cache_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            logger.warning(f"⚠️ Не удалось прочитать кэш медиа: {e}")
+            return {}
+    
+    def _get_cached_validators(self, url: str) -> Tuple[Optional[Dict], Dict]:
+        """Возвращает запись кэша для URL и заголовки условного запроса"""
+        entry = self._load_http_cache().get(url)
+        if not entry:
+            return None, {}
+        # Файл удален, обрезан или заменен - ответ 304 к нему уже не относится
+        try:
+            if Path(entry['path']).stat().st_size != entry.get('size'):
+                return None, {}
+        except OSError:
+            return None, {}
+        headers = {}
+        if entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+        return (entry, headers) if headers else (None, {})
+    
+    def _remember_http_cache(self, url: str, response, local_path: Path):
+        """Сохраняет ETag / Last-Modified ответа для условной загрузки в следующий раз"""
+        etag = response.headers.get('ETag')
+        last_modified = response.headers.get('Last-Modified')
+        if not etag and not last_modified:
+            return
+        with self._http_cache_lock:
+            # Перечитываем манифест перед записью: его могли обновить другие экземпляры и процессы
+            http_cache = self._load_http_cache()
+            http_cache[url] = {
+                'etag': etag,
+                'last_modified': last_modified,
+                'path': str(local_path),
+                'size': local_path.stat().st_size,
+            }
+            temp_path = self._http_cache_path.with_suffix(f'.{os.getpid()}.tmp')
+            try:
+                with open(temp_path, 'w', encoding='utf-8') as f:
+                    json.dump(http_cache, f)
+                os.replace(temp_path, self._http_cache_path)
+            except OSError as e:
+                logger.warning(f"⚠️ Не удалось сохранить кэш медиа: {e}")
+    
     def _get_logo_path_for_source(self, source_name: str) -> str:
         """
         Получает путь к логотипу источника по имени источника
@@ -139,8 +340,8 @@ class MediaManager:
         }
         
         try:
-            images = news_data.get('images', [])
-            videos = news_data.get('videos', [])
+            images = self._dedupe_media_items(news_data.get('images', []))
+            videos = self._dedupe_media_items(news_data.get('videos', []))
             
             # Специальное правило: для POLITICO используем только изображения с домена POLITICO
             source_name = (news_data.get('source') or '').upper()
@@ -235,6 +436,13 @@ class MediaManager:
                             logger.info(f"✅ Twitter видео успешно скачано: {video_path}{offset_info}")
                             return media_result
                 
+                # Изображения-кандидаты по порядку; после первой неудачи следующий кандидат
+                # загружается заранее, пока обрабатывается текущий
+                image_urls = self._image_candidate_urls(images)
+                # url -> (загрузка, существовал ли файл до нее - такой файл при отмене не удаляем)
+                image_downloads: Dict[str, Tuple[Future, bool]] = {}
+                image_failed = False
+                
                 for media_item in images:
                     # Извлекаем URL из словаря или используем как строку
                     if isinstance(media_item, dict):
@@ -282,10 +490,23 @@ class MediaManager:
                             break
                     
                     else:  # Обычное изображение
-                        local_path = self._download_and_process_image(
-                            media_url,
-                            news_data.get('title', 'news')
-                        )
+                        image_download = image_downloads.pop(media_url, (None, False))[0]
+                        if image_failed:
+                            if image_download is None:
+                                image_download = self._download_executor.submit(
+                                    self._download_and_process_image, media_url, news_data.get('title', 'news')
+                                )
+                            self._prefetch_next_image(image_urls, media_url, news_data.get('title', 'news'), image_downloads)
+                        if image_download:
+                            local_path = image_download.result()
+                        else:
+                            # Первый кандидат загружается один - обычно его достаточно
+                            local_path = self._download_and_process_image(
+                                media_url,
+                                news_data.get('title', 'news')
+                            )
+                        if not local_path:
+                            image_failed = True
                         if local_path:
                             media_result.update({
                                 'primary_image': media_url,
@@ -299,6 +520,11 @@ class MediaManager:
                     if not local_path:
                         logger.warning(f"⚠️ Не удалось обработать медиа: {media_url}, пробуем следующее.")
                 
+                # Заранее начатая загрузка больше не нужна: отменяем ее, а если она уже идет - удаляем результат
+                for image_download, existed_before in image_downloads.values():
+                    if not image_download.cancel() and not existed_before:
+                        image_download.add_done_callback(self._discard_prefetched_image)
+                
                 if not media_result.get('local_image_path') and not media_result.get('local_video_path'):
                      logger.error("❌ Не удалось обработать ни одного медиа файла из списка.")
 
@@ -318,23 +544,85 @@ class MediaManager:
             logger.error(f"❌ Ошибка обработки медиа: {e}")
             return media_result
     
+    def _image_candidate_urls(self, images: List) -> List[str]:
+        """URL изображений-кандидатов в порядке списка медиа"""
+        image_urls = []
+        for media_item in images:
+            if isinstance(media_item, dict):
+                media_url = media_item.get('url', media_item.get('src', ''))
+            else:
+                media_url = media_item
+            if media_url and self._detect_media_type(media_url) == 'image':
+                image_urls.append(media_url)
+        return image_urls
+
+    def _prefetch_next_image(self, image_urls: List[str], current_url: str, news_title: str,
+                             image_downloads: Dict[str, Tuple[Future, bool]]):
+        """Запускает в фоне загрузку одного следующего за current_url изображения-кандидата"""
+        try:
+            next_index = image_urls.index(current_url) + 1
+        except ValueError:
+            return
+        if next_index < len(image_urls):
+            next_url = image_urls[next_index]
+            if next_url not in image_downloads:
+                existed_before = Path(next_url).exists() or self._image_local_path(next_url, news_title).exists()
+                image_downloads[next_url] = (
+                    self._download_executor.submit(self._download_and_process_image, next_url, news_title),
+                    existed_before
+                )
+
+    @staticmethod
+    def _discard_prefetched_image(image_download: Future):
+        """Удаляет файл изображения, загруженного заранее, но не понадобившегося"""
+        if image_download.cancelled() or image_download.exception() is not None:
+            return
+        local_path = image_download.result()
+        if local_path:
+            try:
+                os.remove(local_path)
+            except OSError as e:
+                logger.debug(f"Не удалось удалить лишнее изображение {local_path}: {e}")
+
+    def _image_local_path(self, image_url: str, news_title: str) -> Path:
+        """Уникальный путь файла изображения в media_dir (по заголовку новости и хэшу URL)"""
+        return self.media_dir / f"{self._safe_title(news_title, 20)}_{self._url_hash(image_url)}.jpg"
+
+    @staticmethod
+    def _url_hash(url: str) -> str:
+        """Короткий стабильный хэш URL для имени файла (не криптографический)"""
+        return hashlib.blake2b(url.encode(), digest_size=4).hexdigest()
+    
+    @staticmethod
+    def _safe_title(news_title: str, max_length: int) -> str:
+        """Безопасная для имени файла часть заголовка новости"""
+        return SAFE_TITLE_UNSAFE_RE.sub('', news_title[:max_length]).strip().replace(' ', '_')
+
+    @staticmethod
+    def _dedupe_media_items(items: List) -> List:
+        """Удаляет повторяющиеся URL из списка медиа, сохраняя порядок"""
+        seen = set()
+        unique_items = []
+        for item in items or []:
+            url = (item.get('url') or item.get('src')) if isinstance(item, dict) else item
+            if url and url not in seen:
+                seen.add(url)
+                unique_items.append(item)
+        return unique_items
+
     def _is_animated_gif(self, file_path: str) -> bool:
         """Проверяет, является ли GIF файл анимированным"""
         try:
-            from PIL import Image
-            with Image.open(file_path) as img:
-                # Если GIF имеет более одного кадра, он анимированный
-                img.seek(1)  # Пытаемся перейти ко второму кадру
-                return True
-        except (EOFError, OSError):
-            # Если не можем перейти ко второму кадру, GIF статичный
-            return False
-        except Exception:
+            # Сканируем байты без декодирования кадров: анимированный GIF содержит
+            # расширение NETSCAPE2.0 (цикл) или по блоку Graphic Control Extension на каждый кадр
+            with open(file_path, 'rb') as f:
+                data = f.read()
+            return b'NETSCAPE2.0' in data or data.count(b'\x21\xF9\x04') > 1
+        except OSError:
             return False
 
     def _detect_media_type(self, url: str, headers: Dict = None) -> str:
         """Определяет тип медиа файла по URL и заголовкам"""
-        from urllib.parse import urlparse
         
         url_lower = url.lower()
         
@@ -399,13 +687,7 @@ class MediaManager:
             if image_url.startswith(('data:', 'javascript:', '#', 'blob:')):
                 logger.warning(f"⚠️ Пропускаем неподдерживаемый URL: {image_url[:50]}...")
                 return None
-            # Создаем уникальное имя файла
-            url_hash = hashlib.md5(image_url.encode()).hexdigest()[:8]
-            safe_title = "".join(c for c in news_title[:20] if c.isalnum() or c in (' ', '-', '_')).strip()
-            safe_title = safe_title.replace(' ', '_')
-            
-            filename = f"{safe_title}_{url_hash}.jpg"
-            local_path = self.media_dir / filename
+            local_path = self._image_local_path(image_url, news_title)
             
             # Проверяем, не загружено ли уже
             if local_path.exists():
@@ -440,96 +722,119 @@ class MediaManager:
                     return str(local_path)
             
             response = self._download_with_retry(image_url)
-            if not response:
-                # Пробуем Selenium fallback для заблокированных изображений
-                logger.info(f"🔄 Пробуем Selenium fallback для загрузки изображения: {image_url}")
-                image_data = self._download_with_selenium(image_url, self.selenium_driver)
-                if image_data:
-                    # Сохраняем данные напрямую
-                    temp_path = local_path.with_suffix('.tmp')
-                    with open(temp_path, 'wb') as f:
-                        f.write(image_data)
-                    response = None  # Указываем, что используем прямые данные
-                else:
-                    logger.error(f"❌ Не удалось загрузить изображение даже через Selenium: {image_url}")
-                    return None
-            
-            # Сохраняем файл
-            temp_path = local_path.with_suffix('.tmp')
-            
             if response:  # Обычная загрузка через requests
-                # Проверяем размер файла
-                content_length = response.headers.get('Content-Length')
-                if content_length and int(content_length) > self.max_file_size:
-                    logger.warning(f"⚠️ Файл слишком большой: {content_length} байт")
+                # Потоковый ответ держит соединение пула до закрытия - закрываем и при досрочном выходе
+                with response:
+                    # Проверяем размер файла
+                    content_length = response.headers.get('Content-Length')
+                    if content_length and int(content_length) > self.max_file_size:
+                        logger.warning(f"⚠️ Файл слишком большой: {content_length} байт")
+                        return None
+                    
+                    # Декодируем изображение по мере поступления данных, не сохраняя исходник на диск
+                    parser = ImageFile.Parser()
+                    image_data = bytearray()
+                    for chunk in response.iter_content(chunk_size=DOWNLOAD_CHUNK):
+                        image_data += chunk
+                        if len(image_data) > self.max_file_size:
+                            logger.warning(f"⚠️ Файл слишком большой: более {self.max_file_size} байт")
+                            return None
+                        parser.feed(chunk)
+                    img = parser.close()
+            else:
+                # Сначала пробуем подделать TLS-отпечаток браузера, Selenium - только если не помогло
+                image_data = self._download_with_browser_tls(image_url)
+                if not image_data:
+                    logger.info(f"🔄 Пробуем Selenium fallback для загрузки изображения: {image_url}")
+                    with self._selenium_lock:
+                        image_data = self._download_with_selenium(image_url, self.selenium_driver)
+                if not image_data:
+                    logger.error(f"❌ Не удалось загрузить изображение даже через Selenium: {image_url}")
                     return None
-                
-                # Сохраняем временно
-                with open(temp_path, 'wb') as f:
-                    for chunk in response.iter_content(chunk_size=8192):
-                        f.write(chunk)
-            # else: файл уже сохранен через Selenium выше
+                img = Image.open(io.BytesIO(image_data))
             
             # Обрабатываем изображение
-            processed_path = self._process_image_for_shorts(temp_path, local_path)
-            
-            # Удаляем временный файл
-            temp_path.unlink()
-            
-            return processed_path
+            return self._process_downloaded_image(img, image_data, local_path)
             
         except Exception as e:
             logger.error(f"❌ Ошибка загрузки изображения {image_url}: {e}")
             return None
     
-    def _process_image_for_shorts(self, input_path: Path, output_path: Path) -> Optional[str]:
-        """Обработка изображения: изменяет размер с сохранением пропорций и добавляет поля (letterbox)."""
-        try:
-            with Image.open(input_path) as img:
-                # Конвертируем в RGB, если нужно
-                if img.mode != 'RGB':
-                    img = img.convert('RGB')
-
-                # Создаем копию, чтобы .thumbnail не изменил оригинал
-                img_copy = img.copy()
-                
-                # thumbnail изменяет размер изображения inplace, сохраняя пропорции, чтобы оно влезло в target_size
-                img_copy.thumbnail(self.target_size, Image.Resampling.LANCZOS)
-
-                # Создаем черный фон нужного размера (960x540)
-                background = Image.new('RGB', self.target_size, (0, 0, 0))
+    def _is_ready_for_shorts(self, img: Image.Image, output_path: Path) -> bool:
+        """Проверяет, что изображение уже в целевом размере и формате и не требует перекодирования"""
+        return (
+            img.size == self.target_size
+            and img.format == 'JPEG'
+            and output_path.suffix.lower() in ('.jpg', '.jpeg')
+        )
 
-                # Вычисляем позицию для идеального центрирования
-                paste_position = (
-                    (self.target_size[0] - img_copy.width) // 2,
-                    (self.target_size[1] - img_copy.height) // 2
-                )
-
-                # Вставляем отмасштабированное изображение на черный фон
-                background.paste(img_copy, paste_position)
-                
-                # Применяем небольшое улучшение качества к финальному изображению
-                enhancer = ImageEnhance.Contrast(background)
-                final_image = enhancer.enhance(1.1)
-                enhancer = ImageEnhance.Sharpness(final_image)
-                final_image = enhancer.enhance(1.1)
+    def _has_target_aspect(self, img: Image.Image) -> bool:
+        """Проверяет, совпадает ли соотношение сторон с целевым (16:9) с точностью 1%"""
+        target_ratio = self.target_size[0] / self.target_size[1]
+        return abs(img.width / img.height - target_ratio) <= target_ratio * 0.01
 
-                # Сохраняем итоговое изображение
-                final_image.save(output_path, 'JPEG', quality=90, optimize=True)
-                
-                logger.info(f"✅ Изображение обработано (letterbox): {output_path}")
+    def _process_downloaded_image(self, img: Image.Image, image_data: bytes, output_path: Path) -> Optional[str]:
+        """Обработка уже декодированного в памяти изображения (без промежуточного файла)"""
+        try:
+            # Изображение уже 960x540 JPEG - сохраняем исходные байты без повторного кодирования
+            if self._is_ready_for_shorts(img, output_path):
+                output_path.write_bytes(image_data)
+                logger.info(f"✅ Изображение уже в целевом формате, сохранено без обработки: {output_path}")
                 return str(output_path)
+
+            return self._letterbox_for_shorts(img, output_path)
         except Exception as e:
             logger.error(f"❌ Ошибка обработки изображения (letterbox): {e}", exc_info=True)
             return None
+        finally:
+            img.close()
+
+    def _letterbox_for_shorts(self, img: Image.Image, output_path: Path) -> str:
+        """Масштабирует изображение в target_size, добавляет поля (letterbox) и сохраняет в JPEG"""
+        # Конвертируем в RGB, если нужно
+        if img.mode != 'RGB':
+            img = img.convert('RGB')
+
+        if self._has_target_aspect(img):
+            # Соотношение сторон уже 16:9 - поля не нужны, только масштабируем
+            background = img.resize(self.target_size, Image.Resampling.LANCZOS)
+        else:
+            # Создаем копию, чтобы .thumbnail не изменил оригинал
+            img_copy = img.copy()
+
+            # thumbnail изменяет размер изображения inplace, сохраняя пропорции, чтобы оно влезло в target_size
+            img_copy.thumbnail(self.target_size, Image.Resampling.LANCZOS)
+
+            # Создаем черный фон нужного размера (960x540)
+            background = Image.new('RGB', self.target_size, (0, 0, 0))
+
+            # Вычисляем позицию для идеального центрирования
+            paste_position = (
+                (self.target_size[0] - img_copy.width) // 2,
+                (self.target_size[1] - img_copy.height) // 2
+            )
+
+            # Вставляем отмасштабированное изображение на черный фон
+            background.paste(img_copy, paste_position)
+
+        # Применяем небольшое улучшение качества к финальному изображению
+        enhancer = ImageEnhance.Contrast(background)
+        final_image = enhancer.enhance(1.1)
+        enhancer = ImageEnhance.Sharpness(final_image)
+        final_image = enhancer.enhance(1.1)
+
+        # Сохраняем итоговое изображение
+        final_image.save(output_path, 'JPEG', quality=90, optimize=True)
+        
+        logger.info(f"✅ Изображение обработано (letterbox): {output_path}")
+        return str(output_path)
     
     def _download_and_process_gif(self, gif_url: str, news_title: str) -> Optional[str]:
         """Загрузка и обработка GIF файла"""
         try:
             # Создаем уникальное имя файла
-            url_hash = hashlib.md5(gif_url.encode()).hexdigest()[:8]
-            safe_title = "".join(c for c in news_title[:20] if c.isalnum() or c in (' ', '-', '_')).strip()
-            safe_title = safe_title.replace(' ', '_')
+            url_hash = self._url_hash(gif_url)
+            safe_title = self._safe_title(news_title, 20)
             
             filename = f"{safe_title}_{url_hash}.gif"
             local_path = self.media_dir / filename
@@ -541,7 +846,7 @@ class MediaManager:
             
             # Загружаем GIF
             logger.info(f"⬇️ Загружаем GIF: {gif_url}")
-            response = requests.get(
+            response = self.session.get(
                 gif_url, 
                 headers={
                     'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
@@ -558,9 +863,9 @@ class MediaManager:
                 return None
             
             # Сохраняем GIF
+            response.raw.decode_content = True
             with open(local_path, 'wb') as f:
-                for chunk in response.iter_content(chunk_size=8192):
-                    f.write(chunk)
+                shutil.copyfileobj(response.raw, f, length=DOWNLOAD_CHUNK)
             
             logger.info(f"✅ GIF загружен: {local_path}")
             
@@ -570,7 +875,6 @@ class MediaManager:
                 # Переименовываем в .png для правильной обработки
                 png_path = local_path.with_suffix('.png')
                 try:
-                    from PIL import Image
                     with Image.open(local_path) as img:
                         img.save(png_path, 'PNG')
                     local_path.unlink()  # Удаляем оригинальный файл
@@ -609,198 +913,218 @@ class MediaManager:
         
         return self._download_video_direct(video_url, news_title)
     
-    def _download_twitter_video_with_ytdlp(self, video_url: str, news_title: str) -> Optional[str]:
-        """Скачивание Twitter видео через yt-dlp"""
+    @staticmethod
+    def _preallocate(f, content_length: Optional[str]):
+        """Резервирует место под крупный файл, чтобы ФС не наращивала его блоками по мере записи"""
+        if not content_length or not hasattr(os, 'posix_fallocate'):
+            return
+        size = int(content_length)
+        if size < PREALLOCATE_THRESHOLD:
+            return
         try:
-            import subprocess
-            import json
-            from pathlib import Path
-            
-            # Извлекаем tweet ID из URL для yt-dlp
-            if 'pbs.twimg.com' in video_url:
-                logger.warning("⚠️ Прямая ссылка на Twitter медиа заблокирована, нужен URL твита")
-                return None
-            
-            # Создаем безопасное имя файла
-            safe_title = "".join(c for c in news_title if c.isalnum() or c in (' ', '-', '_')).rstrip()[:50]
-            safe_title = safe_title.replace(' ', '_')
-            
-            output_path = self.media_dir / f"{safe_title}_{hash(video_url) % 1000000}.mp4"
-            
-            # Команда yt-dlp с дополнительными опциями для Twitter
-            cmd = [
-                'yt-dlp',
-                '--format', 'best[ext=mp4]/best',  # Лучшее качество в mp4 или любое
-                '--output', str(output_path),
-                '--no-playlist',
-                '--extractor-args', 'twitter:api=syndication',  # Используем syndication API
-                '--user-agent', 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
-                video_url
-            ]
-            
-            logger.info(f"🔄 Пробуем yt-dlp для Twitter видео: {video_url[:50]}...")
-            
-            # Запускаем yt-dlp
-            result = subprocess.run(cmd, capture_output=True, text=True, timeout=60)
-            
-            if result.returncode == 0 and output_path.exists():
-                # Проверяем длительность
-                try:
-                    from moviepy import VideoFileClip
-                    with VideoFileClip(str(output_path)) as video_clip:
-                        duration = video_clip.duration
-                        if duration > self.max_video_duration:
-                            logger.warning(f"⚠️ Видео слишком длинное: {duration}с (максимум {self.max_video_duration}с)")
-                            output_path.unlink()
-                            return None
-                        
-                        logger.info(f"✅ Twitter видео загружено через yt-dlp: {output_path} (длительность: {duration:.1f}с)")
-                        return str(output_path)
-                except ImportError:
-                    logger.info(f"✅ Twitter видео загружено через yt-dlp: {output_path}")
-                    return str(output_path)
-            else:
-                logger.warning(f"⚠️ yt-dlp не смог загрузить видео: {result.stderr}")
-                return None
-                
+            os.posix_fallocate(f.fileno(), 0, size)
+        except OSError:
+            pass
+    
+    @staticmethod
+    def _drop_page_cache(f):
+        """Подсказывает ядру, что записанный файл не нужно держать в page cache"""
+        if not hasattr(os, 'posix_fadvise'):
+            return
+        try:
+            f.flush()
+            # DONTNEED не вытесняет грязные страницы - сначала дожидаемся записи на диск
+            os.fdatasync(f.fileno())
+            os.posix_fadvise(f.fileno(), 0, 0, os.POSIX_FADV_DONTNEED)
+        except OSError:
+            pass
+    
+    @staticmethod
+    def _run_process(cmd: List[str], timeout: float, text: bool = False) -> Optional[subprocess.CompletedProcess]:
+        """Запускает процесс с таймаутом; зависший процесс сначала получает SIGTERM, затем SIGKILL.
+        
+        Returns:
+            CompletedProcess или None при превышении таймаута
+        """
+        proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=text)
+        try:
+            stdout, stderr = proc.communicate(timeout=timeout)
         except subprocess.TimeoutExpired:
-            logger.error("❌ yt-dlp превысил время ожидания (60с)")
-            return None
-        except FileNotFoundError:
-            logger.warning("⚠️ yt-dlp не установлен. Установите: pip install yt-dlp")
-            return None
-        except Exception as e:
-            logger.error(f"❌ Ошибка yt-dlp для Twitter видео: {e}")
+            proc.terminate()
+            try:
+                proc.communicate(timeout=PROCESS_TERMINATE_GRACE)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+                proc.communicate()
+            logger.warning(f"⚠️ Процесс {cmd[0]} превысил таймаут {timeout}с и был остановлен")
             return None
+        return subprocess.CompletedProcess(cmd, proc.returncode, stdout, stderr)
     
-    def _download_brightcove_video_with_ytdlp(self, video_url: str, news_title: str) -> Optional[str]:
-        """Скачивание Brightcove видео через yt-dlp"""
+    def _probe_video_duration(self, video_path: Path) -> Optional[float]:
+        """Читает длительность видео из заголовка контейнера через ffprobe"""
         try:
-            import subprocess
-            import json
-            from pathlib import Path
-            
-            # Создаем безопасное имя файла
-            safe_title = "".join(c for c in news_title if c.isalnum() or c in (' ', '-', '_')).rstrip()[:50]
-            safe_title = safe_title.replace(' ', '_')
-            
-            output_path = self.media_dir / f"{safe_title}_{hash(video_url) % 1000000}.mp4"
-            
-            # Команда yt-dlp для Brightcove
-            cmd = [
-                'yt-dlp',
-                '--format', 'best[ext=mp4]/best',  # Лучшее качество в mp4 или любое
-                '--output', str(output_path),
-                '--no-playlist',
-                '--user-agent', 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
-                video_url
-            ]
-            
-            logger.info(f"🔄 Пробуем yt-dlp для Brightcove видео: {video_url[:50]}...")
-            
-            # Запускаем yt-dlp
-            result = subprocess.run(cmd, capture_output=True, text=True, timeout=60)
-            
-            if result.returncode == 0 and output_path.exists():
-                # Проверяем длительность
-                try:
-                    from moviepy import VideoFileClip
-                    with VideoFileClip(str(output_path)) as video_clip:
-                        duration = video_clip.duration
-                        if duration > self.max_video_duration:
-                            logger.warning(f"⚠️ Видео слишком длинное: {duration}с (максимум {self.max_video_duration}с)")
-                            output_path.unlink()
-                            return None
-                        
-                        logger.info(f"✅ Brightcove видео загружено через yt-dlp: {output_path} (длительность: {duration:.1f}с)")
-                        return str(output_path)
-                except ImportError:
-                    logger.info(f"✅ Brightcove видео загружено через yt-dlp: {output_path}")
-                    return str(output_path)
-            else:
-                logger.warning(f"⚠️ yt-dlp не смог загрузить Brightcove видео: {result.stderr}")
+            result = self._run_process(
+                ['ffprobe', '-v', 'error', '-show_entries', 'format=duration', '-of', 'csv=p=0', str(video_path)],
+                timeout=30
+            )
+            if result is None or result.returncode != 0:
                 return None
-                
-        except subprocess.TimeoutExpired:
-            logger.error("❌ yt-dlp превысил время ожидания для Brightcove видео")
+            return float(result.stdout.strip())
+        except (OSError, ValueError) as e:
+            logger.warning(f"⚠️ Не удалось определить длительность видео {video_path}: {e}")
             return None
-        except FileNotFoundError:
+    
+    def _get_ytdlp(self):
+        """Возвращает экземпляр YoutubeDL этого MediaManager (создается при первом использовании).
+
+        Вызывается под _ydl_lock: параметры отдельной загрузки задаются через ydl.params.
+        """
+        if self._ydl is None:
+            ydl = yt_dlp.YoutubeDL({**YTDLP_BASE_PARAMS, 'http_headers': dict(YTDLP_BASE_PARAMS['http_headers'])})
+            ydl.add_progress_hook(lambda progress: self._abort_ytdlp_after_deadline(ydl))
+            self._ydl = ydl
+        return self._ydl
+    
+    @staticmethod
+    def _abort_ytdlp_after_deadline(ydl):
+        """Хук прогресса: yt-dlp вызывает его на каждом полученном фрагменте - прерываем загрузку после дедлайна"""
+        if time.monotonic() > ydl.params[YTDLP_DEADLINE_PARAM]:
+            raise yt_dlp.utils.DownloadCancelled(f"превышено время ожидания ({YTDLP_TIMEOUT}с)")
+    
+    def _abandon_ytdlp(self):
+        """Оставляет зависший вызов yt-dlp его потоку: следующие загрузки получат новый экземпляр, поток и блокировку"""
+        self._ydl_executor.shutdown(wait=False)
+        self._ydl_executor = ThreadPoolExecutor(max_workers=1)
+        self._ydl_lock = threading.Lock()
+        self._ydl = None
+    
+    def _run_ytdlp(self, video_url: str, output_path: Path, extractor_args: Optional[Dict] = None,
+                   referer: Optional[str] = None) -> bool:
+        """Скачивание видео через экземпляр yt-dlp этого MediaManager; весь вызов ограничен YTDLP_TIMEOUT"""
+        if yt_dlp is None:
             logger.warning("⚠️ yt-dlp не установлен. Установите: pip install yt-dlp")
-            return None
-        except Exception as e:
-            logger.error(f"❌ Ошибка yt-dlp для Brightcove видео: {e}")
-            return None
+            return False
+        
+        deadline = time.monotonic() + YTDLP_TIMEOUT
+        
+        def download() -> bool:
+            with self._ydl_lock:
+                # Загрузка дождалась очереди уже после дедлайна - вызывающий ее не ждет
+                if time.monotonic() > deadline:
+                    return False
+                ydl = self._get_ytdlp()
+                ydl.params['outtmpl'] = {'default': str(output_path)}
+                ydl.params['extractor_args'] = extractor_args or {}
+                ydl.params[YTDLP_DEADLINE_PARAM] = deadline
+                if referer:
+                    ydl.params['http_headers']['Referer'] = referer
+                else:
+                    ydl.params['http_headers'].pop('Referer', None)
+                
+                try:
+                    # Сначала получаем только метаданные и отклоняем слишком длинные/большие видео до загрузки
+                    info = ydl.extract_info(video_url, download=False)
+                    if not self._is_ytdlp_video_acceptable(info):
+                        return False
+                    ydl.process_ie_result(info, download=True)
+                except yt_dlp.utils.DownloadCancelled as e:
+                    logger.error(f"❌ yt-dlp прерван: {e}")
+                    # Удаляем недокачанный файл, чтобы следующая попытка начала загрузку заново
+                    for partial_path in (output_path, output_path.with_name(output_path.name + '.part')):
+                        partial_path.unlink(missing_ok=True)
+                    return False
+                return True
+        
+        # Загрузки идут в отдельном потоке, чтобы ограничить по времени и extract_info
+        future = self._ydl_executor.submit(download)
+        try:
+            return future.result(timeout=YTDLP_TIMEOUT) and output_path.exists()
+        except FuturesTimeoutError:
+            # Вызов продолжает выполняться в своем потоке; начавшуюся загрузку прервет хук прогресса
+            self._abandon_ytdlp()
+            raise
     
-    def _download_apnews_video_with_ytdlp(self, video_url: str, news_title: str) -> Optional[str]:
-        """Скачивание AP News видео через yt-dlp"""
+    def _is_ytdlp_video_acceptable(self, info: Optional[Dict]) -> bool:
+        """Проверяет длительность и размер видео по метаданным yt-dlp"""
+        if not info:
+            return False
+        
+        duration = info.get('duration')
+        if duration and duration > self.max_video_duration:
+            logger.warning(f"⚠️ Видео слишком длинное: {duration}с (максимум {self.max_video_duration}с), пропускаем загрузку")
+            return False
+        
+        filesize = info.get('filesize') or info.get('filesize_approx')
+        if filesize and filesize > self.max_video_size:
+            logger.warning(f"⚠️ Видео слишком большое: {filesize} байт (максимум {self.max_video_size} байт), пропускаем загрузку")
+            return False
+        
+        return True
+    
+    def _download_via_ytdlp(self, video_url: str, news_title: str, label: str, *,
+                            extractor_args: Optional[Dict] = None, referer: Optional[str] = None) -> Optional[str]:
+        """Общая загрузка видео через yt-dlp; источники отличаются только параметрами экстрактора и referer"""
         try:
-            import subprocess
-            import json
-            from pathlib import Path
-            
             # Создаем безопасное имя файла
-            safe_title = "".join(c for c in news_title if c.isalnum() or c in (' ', '-', '_')).rstrip()[:50]
-            safe_title = safe_title.replace(' ', '_')
-            
-            output_path = self.media_dir / f"{safe_title}_{hash(video_url) % 1000000}.mp4"
+            safe_title = self._safe_title(news_title, 50)
+            url_hash = self._url_hash(video_url)
             
-            # Команда yt-dlp для AP News
-            cmd = [
-                'yt-dlp',
-                '--format', 'best[ext=mp4]/best',  # Лучшее качество в mp4 или любое
-                '--output', str(output_path),
-                '--no-playlist',
-                '--user-agent', 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
-                '--referer', 'https://apnews.com/',  # AP News требует referer
-                video_url
-            ]
+            output_path = self.media_dir / f"{safe_title}_{url_hash}.mp4"
             
-            logger.info(f"🔄 Пробуем yt-dlp для AP News видео: {video_url[:50]}...")
+            logger.info(f"🔄 Пробуем yt-dlp для {label} видео: {video_url[:50]}...")
             
-            # Запускаем yt-dlp
-            result = subprocess.run(cmd, capture_output=True, text=True, timeout=60)
+            if not self._run_ytdlp(video_url, output_path, extractor_args=extractor_args, referer=referer):
+                logger.warning(f"⚠️ yt-dlp не смог загрузить {label} видео")
+                return None
             
-            if result.returncode == 0 and output_path.exists():
-                # Проверяем длительность
-                try:
-                    from moviepy import VideoFileClip
-                    with VideoFileClip(str(output_path)) as video_clip:
-                        duration = video_clip.duration
-                        if duration > self.max_video_duration:
-                            logger.warning(f"⚠️ Видео слишком длинное: {duration}с (максимум {self.max_video_duration}с)")
-                            output_path.unlink()
-                            return None
-                        
-                        logger.info(f"✅ AP News видео загружено через yt-dlp: {output_path} (длительность: {duration:.1f}с)")
-                        return str(output_path)
-                except ImportError:
-                    logger.info(f"✅ AP News видео загружено через yt-dlp: {output_path}")
-                    return str(output_path)
-            else:
-                logger.warning(f"⚠️ yt-dlp не смог загрузить AP News видео: {result.stderr}")
+            # Проверяем длительность
+            duration = self._probe_video_duration(output_path)
+            if duration is None:
+                logger.info(f"✅ {label} видео загружено через yt-dlp: {output_path}")
+                return str(output_path)
+            if duration > self.max_video_duration:
+                logger.warning(f"⚠️ Видео слишком длинное: {duration}с (максимум {self.max_video_duration}с)")
+                output_path.unlink()
                 return None
+            
+            logger.info(f"✅ {label} видео загружено через yt-dlp: {output_path} (длительность: {duration:.1f}с)")
+            return str(output_path)
                 
-        except subprocess.TimeoutExpired:
-            logger.error("❌ yt-dlp превысил время ожидания для AP News видео")
-            return None
-        except FileNotFoundError:
-            logger.warning("⚠️ yt-dlp не установлен. Установите: pip install yt-dlp")
+        except FuturesTimeoutError:
+            logger.error(f"❌ yt-dlp превысил время ожидания ({YTDLP_TIMEOUT}с) для {label} видео")
             return None
         except Exception as e:
-            logger.error(f"❌ Ошибка yt-dlp для AP News видео: {e}")
+            logger.error(f"❌ Ошибка yt-dlp для {label} видео: {e}")
             return None
     
+    def _download_twitter_video_with_ytdlp(self, video_url: str, news_title: str) -> Optional[str]:
+        """Скачивание Twitter видео через yt-dlp"""
+        # Извлекаем tweet ID из URL для yt-dlp
+        if 'pbs.twimg.com' in video_url:
+            logger.warning("⚠️ Прямая ссылка на Twitter медиа заблокирована, нужен URL твита")
+            return None
+        # Используем syndication API
+        return self._download_via_ytdlp(video_url, news_title, 'Twitter',
+                                        extractor_args={'twitter': {'api': ['syndication']}})
+    
+    def _download_brightcove_video_with_ytdlp(self, video_url: str, news_title: str) -> Optional[str]:
+        """Скачивание Brightcove видео через yt-dlp"""
+        return self._download_via_ytdlp(video_url, news_title, 'Brightcove')
+    
+    def _download_apnews_video_with_ytdlp(self, video_url: str, news_title: str) -> Optional[str]:
+        """Скачивание AP News видео через yt-dlp"""
+        # AP News требует referer
+        return self._download_via_ytdlp(video_url, news_title, 'AP News', referer='https://apnews.com/')
+    
     def _download_jwplayer_video_direct(self, video_url: str, news_title: str) -> Optional[str]:
         """Скачивание JW Player видео напрямую"""
         try:
-            import requests
-            from pathlib import Path
             
             # Создаем безопасное имя файла
-            safe_title = "".join(c for c in news_title if c.isalnum() or c in (' ', '-', '_')).rstrip()[:50]
-            safe_title = safe_title.replace(' ', '_')
+            safe_title = self._safe_title(news_title, 50)
+            url_hash = self._url_hash(video_url)
             
-            output_path = self.media_dir / f"{safe_title}_{hash(video_url) % 1000000}.mp4"
+            output_path = self.media_dir / f"{safe_title}_{url_hash}.mp4"
             
             logger.info(f"🔄 Скачиваем JW Player видео: {video_url[:50]}...")
             
@@ -809,13 +1133,13 @@ class MediaManager:
                 'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
                 'Referer': 'https://apnews.com/',
                 'Accept': 'video/mp4,video/*,*/*;q=0.9',
-                'Accept-Encoding': 'gzip, deflate, br',
+                'Accept-Encoding': 'identity',  # MP4 уже сжат, повторное сжатие только тратит CPU
                 'Accept-Language': 'en-US,en;q=0.9',
                 'Connection': 'keep-alive',
             }
             
             # Скачиваем видео
-            response = requests.get(video_url, headers=headers, stream=True, timeout=30)
+            response = self.session.get(video_url, headers=headers, stream=True, timeout=30)
             response.raise_for_status()
             
             # Проверяем размер файла
@@ -826,25 +1150,24 @@ class MediaManager:
             
             # Сохраняем файл
             with open(output_path, 'wb') as f:
-                for chunk in response.iter_content(chunk_size=8192):
-                    if chunk:
-                        f.write(chunk)
+                self._preallocate(f, content_length)
+                response.raw.decode_content = True
+                shutil.copyfileobj(response.raw, f, length=VIDEO_DOWNLOAD_CHUNK)
+                f.truncate()  # Обрезаем резерв, если тело оказалось короче Content-Length
+                self._drop_page_cache(f)
             
             # Проверяем длительность
-            try:
-                from moviepy import VideoFileClip
-                with VideoFileClip(str(output_path)) as video_clip:
-                    duration = video_clip.duration
-                    if duration > self.max_video_duration:
-                        logger.warning(f"⚠️ Видео слишком длинное: {duration}с (максимум {self.max_video_duration}с)")
-                        output_path.unlink()
-                        return None
-                    
-                    logger.info(f"✅ JW Player видео загружено: {output_path} (длительность: {duration:.1f}с)")
-                    return str(output_path)
-            except ImportError:
+            duration = self._probe_video_duration(output_path)
+            if duration is None:
                 logger.info(f"✅ JW Player видео загружено: {output_path}")
                 return str(output_path)
+            if duration > self.max_video_duration:
+                logger.warning(f"⚠️ Видео слишком длинное: {duration}с (максимум {self.max_video_duration}с)")
+                output_path.unlink()
+                return None
+            
+            logger.info(f"✅ JW Player видео загружено: {output_path} (длительность: {duration:.1f}с)")
+            return str(output_path)
                 
         except requests.exceptions.RequestException as e:
             logger.error(f"❌ Ошибка загрузки JW Player видео: {e}")
@@ -857,12 +1180,10 @@ class MediaManager:
         """Загрузка и обработка небольшого видео файла"""
         try:
             # Создаем уникальное имя файла
-            url_hash = hashlib.md5(video_url.encode()).hexdigest()[:8]
-            safe_title = "".join(c for c in news_title[:20] if c.isalnum() or c in (' ', '-', '_')).strip()
-            safe_title = safe_title.replace(' ', '_')
+            url_hash = self._url_hash(video_url)
+            safe_title = self._safe_title(news_title, 20)
             
             # Определяем расширение из URL
-            from urllib.parse import urlparse
             parsed_url = urlparse(video_url.lower())
             ext = '.mp4'  # По умолчанию
             if '.' in parsed_url.path:
@@ -878,68 +1199,62 @@ class MediaManager:
                 logger.info(f"📁 Видео уже существует: {local_path}")
                 return str(local_path)
             
-            # Сначала получаем заголовки для проверки размера
-            logger.info(f"🔍 Проверяем размер видео: {video_url}")
-            head_response = requests.head(
-                video_url,
-                headers={
-                    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-                },
-                timeout=10
-            )
-            
-            # Проверяем размер файла
-            content_length = head_response.headers.get('Content-Length')
-            if content_length and int(content_length) > self.max_video_size:
-                logger.warning(f"⚠️ Видео слишком большое: {content_length} байт (максимум {self.max_video_size})")
-                return None
+            # Если URL уже скачивался под другим заголовком - проверяем актуальность условным запросом
+            cached_entry, conditional_headers = self._get_cached_validators(video_url)
             
             # Загружаем видео
             logger.info(f"⬇️ Загружаем видео: {video_url}")
-            response = requests.get(
+            response = self.session.get(
                 video_url, 
                 headers={
-                    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
+                    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36',
+                    'Accept-Encoding': 'identity',
+                    **conditional_headers
                 },
                 timeout=60,  # Больше времени для видео
                 stream=True
             )
+            if response.status_code == 304 and cached_entry:
+                response.close()
+                logger.info(f"📁 Видео не изменилось (304), используем кэш: {cached_entry['path']}")
+                return cached_entry['path']
             response.raise_for_status()
             
+            # Проверяем размер файла по заголовкам ответа, до чтения тела
+            content_length = response.headers.get('Content-Length')
+            if content_length and int(content_length) > self.max_video_size:
+                logger.warning(f"⚠️ Видео слишком большое: {content_length} байт (максимум {self.max_video_size})")
+                response.close()
+                return None
+            
             # Сохраняем видео
             with open(local_path, 'wb') as f:
-                for chunk in response.iter_content(chunk_size=8192):
-                    f.write(chunk)
-            
-            # Проверяем длительность видео с помощью MoviePy
-            try:
-                from moviepy import VideoFileClip
-                with VideoFileClip(str(local_path)) as video_clip:
-                    duration = video_clip.duration
-                    if duration > self.max_video_duration:
-                        logger.warning(f"⚠️ Видео слишком длинное: {duration}с (максимум {self.max_video_duration}с)")
-                        local_path.unlink()  # Удаляем файл
-                        return None
-                    
-                    # Создаем информацию о видео для дальнейшей обработки
-                    video_info = {
-                        'path': str(local_path),
-                        'duration': duration,
-                        'needs_trimming': duration > self.target_short_duration,
-                        'suggested_trim_duration': min(duration, self.target_short_duration)
-                    }
-                    
-                    if duration > self.target_short_duration:  # Если видео длиннее целевой длительности
-                        logger.info(f"✅ Видео загружено: {local_path} (длительность: {duration:.1f}с) - можно использовать начальные {video_info['suggested_trim_duration']}с для шортса")
-                    else:
-                        logger.info(f"✅ Видео загружено: {local_path} (длительность: {duration:.1f}с)")
-                    
-                    return str(local_path)
-                    
-            except ImportError:
-                logger.warning("MoviePy не доступен, пропускаем проверку длительности видео")
+                self._preallocate(f, content_length)
+                response.raw.decode_content = True
+                shutil.copyfileobj(response.raw, f, length=VIDEO_DOWNLOAD_CHUNK)
+                f.truncate()  # Обрезаем резерв, если тело оказалось короче Content-Length
+                self._drop_page_cache(f)
+            
+            # Проверяем длительность видео по заголовку контейнера
+            duration = self._probe_video_duration(local_path)
+            if duration is None:
+                logger.warning("Не удалось определить длительность, пропускаем проверку длительности видео")
                 logger.info(f"✅ Видео загружено: {local_path}")
+                self._remember_http_cache(video_url, response, local_path)
                 return str(local_path)
+            if duration > self.max_video_duration:
+                logger.warning(f"⚠️ Видео слишком длинное: {duration}с (максимум {self.max_video_duration}с)")
+                local_path.unlink()  # Удаляем файл
+                return None
+            
+            if duration > self.target_short_duration:  # Если видео длиннее целевой длительности
+                suggested_trim_duration = min(duration, self.target_short_duration)
+                logger.info(f"✅ Видео загружено: {local_path} (длительность: {duration:.1f}с) - можно использовать начальные {suggested_trim_duration}с для шортса")
+            else:
+                logger.info(f"✅ Видео загружено: {local_path} (длительность: {duration:.1f}с)")
+            
+            self._remember_http_cache(video_url, response, local_path)
+            return str(local_path)
             
         except Exception as e:
             logger.error(f"❌ Ошибка загрузки видео {video_url}: {e}")
@@ -950,42 +1265,45 @@ class MediaManager:
     
     def get_background_music(self) -> Optional[str]:
         """Выбирает случайный трек из папки с музыкой."""
-        music_dir = Path("resources/music")
-        
-        if not music_dir.exists():
-            logger.warning("📁 Папка resources/music не найдена")
-            return None
+        music_dir = "resources/music"
         
         # Поддерживаемые аудио форматы
-        audio_extensions = ['.mp3', '.wav', '.ogg', '.m4a']
+        audio_extensions = {'.mp3', '.wav', '.ogg', '.m4a'}
         
-        # Находим все аудиофайлы
-        music_files = []
-        for ext in audio_extensions:
-            music_files.extend(music_dir.glob(f"*{ext}"))
+        # Находим все аудиофайлы за один проход по папке
+        try:
+            with os.scandir(music_dir) as entries:
+                music_files = [
+                    entry.path for entry in entries
+                    if entry.is_file() and os.path.splitext(entry.name)[1].lower() in audio_extensions
+                ]
+        except FileNotFoundError:
+            logger.warning("📁 Папка resources/music не найдена")
+            return None
         
         if not music_files:
             logger.warning("🎵 Фоновая музыка не найдена")
             return None
         
         # Возвращаем случайный файл
-        import random
         selected_music = random.choice(music_files)
-        logger.info(f"🎵 Выбрана фоновая музыка: {selected_music.name}")
-        return str(selected_music)
+        logger.info(f"🎵 Выбрана фоновая музыка: {os.path.basename(selected_music)}")
+        return selected_music
     
     def cleanup_old_media(self, days_old: int = 7):
         """Очистка старых медиа-файлов"""
         try:
-            import time
             current_time = time.time()
             cutoff_time = current_time - (days_old * 24 * 60 * 60)
             
             cleaned_count = 0
-            for file_path in self.media_dir.glob("*"):
-                if file_path.is_file() and file_path.stat().st_mtime < cutoff_time:
-                    file_path.unlink()
-                    cleaned_count += 1
+            with os.scandir(self.media_dir) as entries:
+                for entry in entries:
+                    if entry.name.startswith('.'):
+                        continue  # Служебные файлы (манифест кэша)
+                    if entry.is_file(follow_symlinks=False) and entry.stat().st_mtime < cutoff_time:
+                        os.unlink(entry.path)
+                        cleaned_count += 1
             
             if cleaned_count > 0:
                 logger.info(f"🧹 Удалено {cleaned_count} старых медиа-файлов")
@@ -1032,13 +1350,11 @@ class MediaManager:
         """Специальная загрузка изображений POLITICO с обходом блокировок"""
         try:
             # Извлекаем прямую ссылку из POLITICO CDN URL
-            if 'dims4/default/resize' in image_url and 'url=' in image_url:
+            if 'dims4/default/resize' in image_url:
                 # Декодируем URL из параметра url=
-                import urllib.parse
-                parsed_url = urllib.parse.urlparse(image_url)
-                query_params = urllib.parse.parse_qs(parsed_url.query)
-                if 'url' in query_params:
-                    direct_url = urllib.parse.unquote(query_params['url'][0])
+                match = POLITICO_URL_RE.search(image_url)
+                if match:
+                    direct_url = unquote(match.group(1))
                     logger.info(f"🔗 Извлечена прямая ссылка POLITICO: {direct_url}")
                     
                     # Пробуем загрузить прямую ссылку с POLITICO headers
@@ -1047,17 +1363,18 @@ class MediaManager:
                         'Referer': 'https://www.politico.com/',
                         'Accept': 'image/webp,image/apng,image/svg+xml,image/*,*/*;q=0.8',
                         'Accept-Language': 'en-US,en;q=0.9',
-                        'Accept-Encoding': 'gzip, deflate, br',
+                        'Accept-Encoding': 'gzip, deflate',
                         'Connection': 'keep-alive',
                         'Upgrade-Insecure-Requests': '1'
                     }
                     
-                    response = requests.get(direct_url, headers=headers, timeout=10)
+                    response = self.session.get(direct_url, headers=headers, timeout=10)
                     if response.status_code == 200:
                         logger.info(f"✅ POLITICO изображение загружено: {len(response.content)} байт")
                         return response.content
                     else:
                         logger.warning(f"⚠️ Прямая ссылка POLITICO вернула {response.status_code}")
+                        return self._download_with_browser_tls(direct_url, headers)
                         
         except Exception as e:
             logger.warning(f"⚠️ Ошибка загрузки POLITICO изображения: {e}")
@@ -1073,46 +1390,47 @@ class MediaManager:
                 'Referer': 'https://www.lemonde.fr/',
                 'Accept': 'image/webp,image/apng,image/svg+xml,image/*,*/*;q=0.8',
                 'Accept-Language': 'en-US,en;q=0.9,fr;q=0.8',
-                'Accept-Encoding': 'gzip, deflate, br',
+                'Accept-Encoding': 'gzip, deflate',
                 'Connection': 'keep-alive',
                 'Sec-Fetch-Dest': 'image',
                 'Sec-Fetch-Mode': 'no-cors',
                 'Sec-Fetch-Site': 'same-site'
             }
             
-            response = requests.get(image_url, headers=headers, timeout=10)
+            response = self.session.get(image_url, headers=headers, timeout=10)
             if response.status_code == 200:
                 logger.info(f"✅ Le Monde изображение загружено: {len(response.content)} байт")
                 return response.content
             else:
                 logger.warning(f"⚠️ Le Monde изображение вернуло {response.status_code}")
+                return self._download_with_browser_tls(image_url, headers)
                         
         except Exception as e:
             logger.warning(f"⚠️ Ошибка загрузки Le Monde изображения: {e}")
             
         return None
     
+    def _download_with_browser_tls(self, url: str, headers: Optional[Dict] = None) -> Optional[bytes]:
+        """Загрузка через curl_cffi с TLS-отпечатком Chrome - дешевле, чем запуск браузера"""
+        if cffi_requests is None:
+            return None
+        try:
+            response = cffi_requests.get(url, headers=headers, impersonate=CFFI_IMPERSONATE, timeout=10)
+            if response.status_code == 200 and len(response.content) <= self.max_file_size:
+                logger.info(f"✅ Изображение загружено через curl_cffi: {len(response.content)} байт")
+                return response.content
+            logger.warning(f"⚠️ curl_cffi вернул {response.status_code} для {url[:50]}...")
+        except Exception as e:
+            logger.warning(f"⚠️ Ошибка загрузки через curl_cffi: {e}")
+        return None
+    
     def _download_with_retry(self, url: str, max_attempts: int = 3):
         """Загрузка файла с retry механизмом и разными User-Agent"""
-        import random
-        import time
         
         for attempt in range(max_attempts):
             try:
                 # Создаем расширенные заголовки
-                headers = {
-                    'User-Agent': random.choice(self.user_agents),
-                    'Accept': 'image/avif,image/webp,image/apng,image/svg+xml,image/*,*/*;q=0.8',
-                    'Accept-Language': 'en-US,en;q=0.9,ru;q=0.8',
-                    'Accept-Encoding': 'gzip, deflate, br',
-                    'DNT': '1',
-                    'Connection': 'keep-alive',
-                    'Upgrade-Insecure-Requests': '1',
-                    'Sec-Fetch-Dest': 'image',
-                    'Sec-Fetch-Mode': 'no-cors',
-                    'Sec-Fetch-Site': 'cross-site',
-                    'Cache-Control': 'max-age=0'
-                }
+                headers = {**IMAGE_REQUEST_HEADERS, 'User-Agent': next(self._ua_cycle)}
                 
                 # Добавляем Referer для некоторых сайтов
                 if 'politico.com' in url.lower():
@@ -1124,7 +1442,7 @@ class MediaManager:
                     time.sleep(2)  # Пауза между попытками
                     logger.info(f"🔄 Попытка {attempt + 1} загрузки: {url[:50]}...")
                 
-                response = requests.get(
+                response = self.session.get(
                     url,
                     headers=headers,
                     timeout=30,
@@ -1155,76 +1473,55 @@ class MediaManager:
         return None
     
     def _download_with_selenium(self, image_url: str, existing_driver=None) -> Optional[bytes]:
-        """Загрузка изображения через Selenium для обхода блокировок"""
+        """Загрузка изображения через Selenium для обхода блокировок (вызывается под _selenium_lock)"""
+        if webdriver is None:
+            logger.warning("⚠️ Selenium не доступен для загрузки изображений")
+            return None
+
         try:
-            # Импортируем Selenium компоненты
-            from selenium import webdriver
-            from selenium.webdriver.chrome.options import Options
-            from selenium.webdriver.common.by import By
-            import time
-            
-            # Используем существующий driver если доступен, иначе создаем новый
-            if existing_driver:
-                driver = existing_driver
-                should_quit = False
+            # Используем существующий driver если доступен, иначе общий (запускается один раз на процесс)
+            driver = existing_driver or self._get_shared_selenium_driver()
+            
+            # Если используем существующий driver, не переходим на другую страницу
+            # Для POLITICO изображения загружаем в контексте текущей страницы
+            if not existing_driver:
+                # Переходим на страницу с изображением только для нового driver
+                driver.get(image_url)
+                time.sleep(3)  # Даем время загрузиться
+            
+            # Получаем изображение как base64 через JavaScript
+            script = """
+            var canvas = document.createElement('canvas');
+            var ctx = canvas.getContext('2d');
+            var img = new Image();
+            img.crossOrigin = 'anonymous';
+            
+            return new Promise((resolve) => {
+                img.onload = function() {
+                    canvas.width = img.width;
+                    canvas.height = img.height;
+                    ctx.drawImage(img, 0, 0);
+                    resolve(canvas.toDataURL('image/jpeg', 0.8).split(',')[1]);
+                };
+                img.onerror = function() { resolve(null); };
+                img.src = arguments[0];
+            });
+            """
+            
+            base64_data = driver.execute_async_script(script, image_url)
+            
+            if base64_data:
+                # Декодируем base64 в байты
+                image_bytes = base64.b64decode(base64_data)
+                logger.info(f"✅ Изображение загружено через Selenium: {len(image_bytes)} байт")
+                return image_bytes
             else:
-                # Настройка Chrome для скрытой работы
-                chrome_options = Options()
-                chrome_options.add_argument("--headless")
-                chrome_options.add_argument("--no-sandbox")
-                chrome_options.add_argument("--disable-dev-shm-usage")
-                chrome_options.add_argument("--disable-gpu")
-                chrome_options.add_argument("--disable-images")  # Парадоксально, но помогает избежать блокировок
-                chrome_options.add_argument("--user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36")
-                
-                driver = webdriver.Chrome(options=chrome_options)
-                should_quit = True
-            
-            try:
-                # Если используем существующий driver, не переходим на другую страницу
-                # Для POLITICO изображения загружаем в контексте текущей страницы
-                if not existing_driver:
-                    # Переходим на страницу с изображением только для нового driver
-                    driver.get(image_url)
-                    time.sleep(3)  # Даем время загрузиться
-                
-                # Получаем изображение как base64 через JavaScript
-                script = """
-                var canvas = document.createElement('canvas');
-                var ctx = canvas.getContext('2d');
-                var img = new Image();
-                img.crossOrigin = 'anonymous';
-                
-                return new Promise((resolve) => {
-                    img.onload = function() {
-                        canvas.width = img.width;
-                        canvas.height = img.height;
-                        ctx.drawImage(img, 0, 0);
-                        resolve(canvas.toDataURL('image/jpeg', 0.8).split(',')[1]);
-                    };
-                    img.onerror = function() { resolve(null); };
-                    img.src = arguments[0];
-                });
-                """
-                
-                base64_data = driver.execute_async_script(script, image_url)
-                
-                if base64_data:
-                    # Декодируем base64 в байты
-                    image_bytes = base64.b64decode(base64_data)
-                    logger.info(f"✅ Изображение загружено через Selenium: {len(image_bytes)} байт")
-                    return image_bytes
-                else:
-                    logger.warning("⚠️ Не удалось получить изображение через JavaScript")
-                    return None
-                    
-            finally:
-                if should_quit:
-                    driver.quit()
+                logger.warning("⚠️ Не удалось получить изображение через JavaScript")
+                return None
                 
-        except ImportError:
-            logger.warning("⚠️ Selenium не доступен для загрузки изображений")
-            return None
         except Exception as e:
             logger.error(f"❌ Ошибка загрузки через Selenium: {e}")
             return None
+
+
+atexit.register(MediaManager.close_shared_selenium_driver)
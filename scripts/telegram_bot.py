@@ -8,15 +8,48 @@ import os
 import sys
 import logging
 import asyncio
+import copy
+import itertools
+import json
+import queue
 import re
+import threading
 import time
-from typing import Dict, Optional, Any
+from collections import defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, Optional, TypedDict
+from urllib.parse import urlsplit
 import yaml
 import sqlite3
+import requests
+from requests.adapters import HTTPAdapter
 from datetime import datetime
 
+# LibYAML-парсер на C, если PyYAML собран с ним
+try:
+    from yaml import CSafeLoader as YamlLoader
+except ImportError:
+    from yaml import SafeLoader as YamlLoader
+
+# Событийный цикл на libuv для бота, если установлен (не поддерживается в Windows)
+try:
+    import uvloop
+except ImportError:
+    uvloop = None
+
+# Быстрый JSON-парсер на C для списков медиа, если установлен
+try:
+    from orjson import loads as json_loads
+except ImportError:
+    json_loads = json.loads
+
+# Каталог скрипта (вычисляется один раз при импорте)
+_SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+
 # Добавление пути к модулям
-sys.path.append(os.path.dirname(__file__))
+sys.path.append(_SCRIPT_DIR)
 
 from telegram import Update, Bot
 from telegram.ext import (
@@ -34,6 +67,130 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Настройки каждого соединения с БД новостей (journal_mode=WAL хранится в самом файле БД)
+SQLITE_CONNECTION_PRAGMAS = (
+    'PRAGMA synchronous=NORMAL',
+    'PRAGMA temp_store=MEMORY',
+    'PRAGMA cache_size=-64000',
+    'PRAGMA mmap_size=268435456',  # Чтение горячих страниц через mmap (до 256 МБ), без read() на каждую
+    'PRAGMA busy_timeout=5000',
+)
+
+# Версия схемы БД новостей (PRAGMA user_version); увеличивать при изменении таблиц или индексов
+NEWS_DB_SCHEMA_VERSION = 3
+
+# Сколько соединений только для чтения держать открытыми
+SQLITE_READER_POOL_SIZE = 4
+# Автоматический checkpoint WAL раз в столько страниц (по умолчанию 1000) - реже fsync при пачках записей
+SQLITE_WAL_AUTOCHECKPOINT = 10000
+# Кэш подготовленных запросов на соединение (по тексту SQL); соединения живут весь срок работы бота
+SQLITE_STATEMENT_CACHE_SIZE = 256
+
+# Частые запросы: один и тот же текст SQL берется из кэша подготовленных запросов соединения
+SQL_URL_EXISTS = 'SELECT 1 FROM user_news WHERE url = ?'
+SQL_GET_NEWS_BY_ID = 'SELECT * FROM user_news WHERE id = ?'
+SQL_MARK_VIDEO_CREATED = 'UPDATE user_news SET video_created = 1, video_url = ? WHERE id = ?'
+
+class ParseResult(TypedDict, total=False):
+    """Результат _parse_url_with_engines (обычный dict: его дополняют channel_monitor и _save_parsed_news)"""
+    success: bool
+    url: str
+    error: str
+    title: str
+    description: str
+    content: str
+    published: str
+    source: str
+    author: str
+    username: str
+    images: list
+    videos: list
+    content_type: str
+
+
+# Статические ответы бота
+WELCOME_MESSAGE = """
+🤖 Привет! Я бот для создания новостных Shorts!
+
+📝 Отправьте мне ссылку на новость, и я создам из неё короткое видео для YouTube.
+
+📋 Поддерживаемые форматы:
+• Прямые ссылки на новости
+• Ссылки из Telegram каналов
+• Любые URL с новостным контентом
+
+⚙️ Доступные команды:
+/start - показать это сообщение
+/stats - показать статистику
+/help - справка
+
+🚀 Просто отправьте ссылку на новость!
+        """
+
+HELP_MESSAGE = """
+📖 Справка по использованию бота
+
+🎯 Как использовать:
+1. Найдите интересную новость
+2. Скопируйте ссылку на неё
+3. Отправьте ссылку мне в чат
+
+🤖 Что делает бот:
+• Извлекает текст новости по ссылке
+• Создает краткое содержание с помощью ИИ
+• Генерирует анимированное видео
+• Загружает видео на YouTube Shorts
+
+📊 Форматы ссылок:
+✅ https://www.bbc.com/news/article
+✅ https://cnn.com/article
+✅ https://t.me/channel/123
+✅ Любые другие URL
+
+⚠️ Ограничения:
+• Ссылка должна вести на новость
+• Новость должна быть на русском или английском
+• Максимум 5 ссылок в час от одного пользователя
+
+📈 Статистика: /stats
+        """
+
+STATS_MESSAGE_TEMPLATE = """
+📊 Статистика бота
+
+⏱️ Время работы: {runtime}
+📨 Получено ссылок: {received}
+✅ Обработано: {processed}
+⏳ В очереди: {pending}
+📈 Всего в БД: {total}
+
+🤖 Статус: {status}
+        """
+
+# Ссылки в тексте сообщений
+URL_RE = re.compile(r'https?://[^\s]+')
+MAX_URLS_PER_MESSAGE = 3  # Максимум ссылок, обрабатываемых из одного сообщения
+
+# Ограничение частоты: не больше RATE_LIMIT_MAX_LINKS новостей от пользователя за RATE_LIMIT_WINDOW секунд
+RATE_LIMIT_MAX_LINKS = 5
+RATE_LIMIT_WINDOW = 3600
+RATE_LIMIT_GC_THRESHOLD = 1000  # Сколько пользователей держать, прежде чем чистить неактивных
+RATE_LIMIT_MESSAGE = (
+    f"⏳ Превышен лимит: не больше {RATE_LIMIT_MAX_LINKS} ссылок за {RATE_LIMIT_WINDOW // 60} мин. Попробуйте позже."
+)
+
+# Группировка сервисных уведомлений: не чаще одного сообщения раз в интервал
+NOTIFY_BATCH_INTERVAL = 2.0
+NOTIFY_BATCH_MAX_ITEMS = 20
+TELEGRAM_MESSAGE_LIMIT = 4096
+VIDEO_NOTIFY_FOOTER = (
+    "Укажите старт (в секундах) командой: /startat <news_id> <seconds>\n"
+    "Оставьте как есть — будет 0 c."
+)
+
+# Разобранные конфиги по (путь, mtime, размер): повторное создание бота не перечитывает YAML
+_CONFIG_CACHE: Dict[tuple, Dict] = {}
+
 class NewsTelegramBot:
     """Telegram бот для приема новостей"""
 
@@ -52,6 +209,16 @@ class NewsTelegramBot:
         # Токен бота, который отправляет сервисные сообщения (по умолчанию тот же)
         self.publish_bot_token = os.getenv("PUBLISH_BOT_TOKEN", self.bot_token)
 
+        # Общая HTTP-сессия для сервисных сообщений: одно TLS-соединение к api.telegram.org
+        self._http = requests.Session()
+        self._http.mount('https://', HTTPAdapter(pool_connections=4, pool_maxsize=16))
+        # Сервисные уведомления отправляются в фоне по одному, не задерживая сохранение новости
+        self._notify_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='group-notify')
+        self._notify_buffer: list[str] = []
+        self._notify_lock = threading.Lock()
+        self._notify_wakeup = threading.Event()
+        self._notify_flush_scheduled = False
+
         # Диагностика конфигурации отправки
         try:
             masked_push = (self.publish_bot_token[:6] + "..." + self.publish_bot_token[-4:]) if self.publish_bot_token else ""
@@ -63,27 +230,131 @@ class NewsTelegramBot:
         from engines.registry import EngineRegistry
         self.engine_registry = EngineRegistry()
 
+        # Тестовый режим: повторно сохраненная ссылка перезаписывает старую запись
+        self._dev_overwrite = self.config.get('dev', {}).get('overwrite_on_save', False)
+
         # Инициализация БД для пользовательских новостей
         self.db_path = os.path.join(self.project_path, 'data', 'user_news.db')
         self._init_user_news_db()
 
+        # Время последних принятых новостей по пользователям (для лимита из /help)
+        self._rate: Dict[int, deque] = defaultdict(deque)
+
         # Статистика
         self.stats = {
             'received_links': 0,
             'processed_links': 0,
-            'start_time': datetime.now()
+            'start_time': datetime.now(),
+            'start_mono': time.monotonic()  # Для расчета времени работы, не зависит от перевода часов
         }
 
     def _load_config(self, config_path: str) -> Dict:
-        """Загрузка конфигурации"""
-        with open(config_path, 'r', encoding='utf-8') as f:
-            return yaml.safe_load(f)
+        """Загрузка конфигурации (кэшируется до изменения файла)"""
+        stat = os.stat(config_path)
+        key = (os.path.abspath(config_path), stat.st_mtime_ns, stat.st_size)
+        config = _CONFIG_CACHE.get(key)
+        if config is None:
+            with open(config_path, 'r', encoding='utf-8') as f:
+                config = yaml.load(f, Loader=YamlLoader)
+            _CONFIG_CACHE[key] = config
+        return copy.deepcopy(config)
+
+    def _connect(self, read_only: bool = False) -> sqlite3.Connection:
+        """Открывает соединение с БД новостей с настроенными PRAGMA"""
+        if read_only:
+            conn = sqlite3.connect(f"{Path(self.db_path).resolve().as_uri()}?mode=ro", uri=True,
+                                   check_same_thread=False, cached_statements=SQLITE_STATEMENT_CACHE_SIZE)
+            conn.row_factory = sqlite3.Row
+        else:
+            # Транзакции пишущего соединения открываются явно через BEGIN IMMEDIATE
+            conn = sqlite3.connect(self.db_path, check_same_thread=False, isolation_level=None,
+                                   cached_statements=SQLITE_STATEMENT_CACHE_SIZE)
+        for pragma in SQLITE_CONNECTION_PRAGMAS:
+            conn.execute(pragma)
+        return conn
+
+    @contextmanager
+    def _write_transaction(self) -> Iterator[sqlite3.Connection]:
+        """Транзакция на общем пишущем соединении (одна запись за раз)"""
+        with self._write_lock:
+            self._writer.execute('BEGIN IMMEDIATE')
+            try:
+                yield self._writer
+            except BaseException:
+                self._writer.rollback()
+                raise
+            else:
+                self._writer.commit()
+
+    @contextmanager
+    def _read_connection(self) -> Iterator[sqlite3.Connection]:
+        """Берет соединение только для чтения из пула и возвращает его обратно"""
+        conn = self._readers.get()
+        try:
+            yield conn
+        finally:
+            self._readers.put(conn)
+
+    def close(self):
+        """Дожидается отправки уведомлений, закрывает HTTP-сессию и соединения с БД (с checkpoint WAL)"""
+        self._notify_wakeup.set()
+        self._notify_executor.shutdown(wait=True)
+        self._http.close()
+        while True:
+            try:
+                self._readers.get_nowait().close()
+            except queue.Empty:
+                break
+        with self._write_lock:
+            if self._writer is not None:
+                try:
+                    self._writer.execute('PRAGMA optimize')
+                except sqlite3.Error as e:
+                    logger.warning(f"Не удалось обновить статистику базы данных: {e}")
+                # Переносим WAL в основной файл и обрезаем его, чтобы журнал не рос между запусками
+                try:
+                    self._writer.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+                except sqlite3.Error as e:
+                    logger.warning(f"Не удалось выполнить checkpoint WAL: {e}")
+                self._writer.close()
+                self._writer = None
 
     def _init_user_news_db(self):
         """Инициализация расширенной базы данных для новостей"""
         os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
 
-        with sqlite3.connect(self.db_path) as conn:
+        # Соединения открыты на все время жизни бота
+        self._write_lock = threading.Lock()
+        self._writer = self._connect()
+
+        # WAL: читатели (оркестратор, /stats) не блокируются записью монитора
+        journal_mode = self._writer.execute('PRAGMA journal_mode=WAL').fetchone()[0]
+        if journal_mode.lower() != 'wal':
+            logger.warning(f"⚠️ Не удалось включить WAL для БД новостей (режим: {journal_mode})")
+        # Checkpoint выполняет соединение, которое пишет, - настройка нужна только пишущему
+        self._writer.execute(f'PRAGMA wal_autocheckpoint={SQLITE_WAL_AUTOCHECKPOINT}')
+
+        # Создание и миграция схемы - только если версия схемы в файле БД устарела
+        schema_version = self._writer.execute('PRAGMA user_version').fetchone()[0]
+        if schema_version < NEWS_DB_SCHEMA_VERSION:
+            self._migrate_user_news_db()
+
+        # Обновляет статистику планировщика только для таблиц, где она устарела
+        try:
+            self._writer.execute('PRAGMA optimize')
+        except sqlite3.Error as e:
+            logger.warning(f"Не удалось обновить статистику базы данных: {e}")
+
+        logger.info(f"Расширенная база данных новостей инициализирована: {self.db_path}")
+
+        # Схема готова - открываем соединения только для чтения
+        self._readers = queue.Queue()
+        for _ in range(SQLITE_READER_POOL_SIZE):
+            self._readers.put(self._connect(read_only=True))
+
+    def _migrate_user_news_db(self):
+        """Создание таблиц, недостающих столбцов и индексов; в конце записывает версию схемы"""
+        with self._write_transaction() as conn:
             # Основная таблица новостей
             conn.execute('''
                 CREATE TABLE IF NOT EXISTS user_news (
@@ -109,6 +380,7 @@ class NewsTelegramBot:
                     images TEXT,
                     videos TEXT,
                     local_video_path TEXT,
+                    avatar_url TEXT,
                     avatar_path TEXT
                 )
             ''')
@@ -137,13 +409,9 @@ class NewsTelegramBot:
                 )
             ''')
 
-            conn.commit()
-        
-        logger.info(f"Расширенная база данных новостей инициализирована: {self.db_path}")
-
-        # Миграция: добавить недостающие столбцы
+        # Миграция: добавить недостающие столбцы и индексы
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with self._write_transaction() as conn:
                 cursor = conn.cursor()
                 cursor.execute("PRAGMA table_info(user_news)")
                 columns = {row[1] for row in cursor.fetchall()}
@@ -154,6 +422,7 @@ class NewsTelegramBot:
                     'images': 'TEXT',
                     'videos': 'TEXT',
                     'local_video_path': 'TEXT',
+                    'avatar_url': 'TEXT',
                     'avatar_path': 'TEXT'
                 }
                 
@@ -161,91 +430,58 @@ class NewsTelegramBot:
                     if col not in columns:
                         cursor.execute(f'ALTER TABLE user_news ADD COLUMN {col} {col_type}')
                         logger.info(f"🔧 Добавлен столбец {col} в таблицу user_news")
-                
-                conn.commit()
+
+                # Индексы для очереди обработки и выборки дочерних записей.
+                # url уже покрыт автоматическим UNIQUE-индексом из определения таблицы.
+                conn.execute('CREATE INDEX IF NOT EXISTS idx_user_news_processed_received ON user_news (processed, received_at)')
+                conn.execute('CREATE INDEX IF NOT EXISTS idx_news_images_news_id ON news_images (news_id)')
+                # Источники выбираются по news_id уже отсортированными по уверенности - без отдельной сортировки
+                conn.execute('DROP INDEX IF EXISTS idx_fact_check_sources_news_id')
+                conn.execute('CREATE INDEX IF NOT EXISTS idx_fact_check_sources_news_confidence '
+                             'ON fact_check_sources (news_id, confidence_score DESC)')
+
+                # Версия записывается в той же транзакции: при ошибке миграция повторится при следующем запуске
+                conn.execute(f'PRAGMA user_version = {NEWS_DB_SCHEMA_VERSION}')
         except Exception as e:
             logger.warning(f"Не удалось выполнить миграцию базы данных: {e}")
 
     async def start_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Обработчик команды /start"""
-        welcome_message = """
-🤖 Привет! Я бот для создания новостных Shorts!
-
-📝 Отправьте мне ссылку на новость, и я создам из неё короткое видео для YouTube.
-
-📋 Поддерживаемые форматы:
-• Прямые ссылки на новости
-• Ссылки из Telegram каналов
-• Любые URL с новостным контентом
-
-⚙️ Доступные команды:
-/start - показать это сообщение
-/stats - показать статистику
-/help - справка
-
-🚀 Просто отправьте ссылку на новость!
-        """
-
-        await update.message.reply_text(welcome_message)
+        await update.message.reply_text(WELCOME_MESSAGE)
 
     async def help_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Обработчик команды /help"""
-        help_message = """
-📖 Справка по использованию бота
-
-🎯 Как использовать:
-1. Найдите интересную новость
-2. Скопируйте ссылку на неё
-3. Отправьте ссылку мне в чат
-
-🤖 Что делает бот:
-• Извлекает текст новости по ссылке
-• Создает краткое содержание с помощью ИИ
-• Генерирует анимированное видео
-• Загружает видео на YouTube Shorts
-
-📊 Форматы ссылок:
-✅ https://www.bbc.com/news/article
-✅ https://cnn.com/article
-✅ https://t.me/channel/123
-✅ Любые другие URL
-
-⚠️ Ограничения:
-• Ссылка должна вести на новость
-• Новость должна быть на русском или английском
-• Максимум 5 ссылок в час от одного пользователя
-
-📈 Статистика: /stats
-        """
-
-        await update.message.reply_text(help_message)
+        await update.message.reply_text(HELP_MESSAGE)
 
     async def stats_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Обработчик команды /stats"""
-        with sqlite3.connect(self.db_path) as conn:
+        stats = await asyncio.to_thread(self._get_news_counts)
+
+        elapsed = int(time.monotonic() - self.stats['start_mono'])
+        hours, rest = divmod(elapsed, 3600)
+        minutes, seconds = divmod(rest, 60)
+
+        stats_message = STATS_MESSAGE_TEMPLATE.format(
+            runtime=f"{hours}:{minutes:02d}:{seconds:02d}",
+            received=self.stats['received_links'],
+            processed=stats[1] if stats else 0,
+            pending=stats[2] if stats else 0,
+            total=stats[0] if stats else 0,
+            status='🟢 Активен' if self.stats['received_links'] > 0 else '🟡 Ожидание'
+        )
+
+        await update.message.reply_text(stats_message)
+
+    def _get_news_counts(self):
+        """Количество новостей в БД: всего, обработано, в очереди"""
+        with self._read_connection() as conn:
             cursor = conn.execute('''
                 SELECT COUNT(*) as total,
                        COUNT(CASE WHEN processed = 1 THEN 1 END) as processed,
                        COUNT(CASE WHEN processed = 0 THEN 1 END) as pending
                 FROM user_news
             ''')
-            stats = cursor.fetchone()
-
-        runtime = datetime.now() - self.stats['start_time']
-
-        stats_message = f"""
-📊 Статистика бота
-
-⏱️ Время работы: {str(runtime).split('.')[0]}
-📨 Получено ссылок: {self.stats['received_links']}
-✅ Обработано: {stats[1] if stats else 0}
-⏳ В очереди: {stats[2] if stats else 0}
-📈 Всего в БД: {stats[0] if stats else 0}
-
-🤖 Статус: {'🟢 Активен' if self.stats['received_links'] > 0 else '🟡 Ожидание'}
-        """
-
-        await update.message.reply_text(stats_message)
+            return cursor.fetchone()
 
     async def startat_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Установка стартового времени для видео: /startat <news_id> <seconds>"""
@@ -262,9 +498,9 @@ class NewsTelegramBot:
 
             news_id = int(args[0])
             seconds = float(args[1])
-            with sqlite3.connect(self.db_path) as conn:
-                conn.execute('UPDATE user_news SET video_start_seconds=? WHERE id=?', (seconds, news_id))
-                conn.commit()
+            if not await asyncio.to_thread(self._set_video_start_seconds, news_id, seconds):
+                await update.message.reply_text(f"❌ Не удалось установить старт для новости {news_id}")
+                return
             await update.message.reply_text(f"✅ Старт для видео новости {news_id} установлен: {seconds} c")
         except Exception as e:
             await update.message.reply_text(f"❌ Ошибка: {e}")
@@ -272,17 +508,12 @@ class NewsTelegramBot:
     def _set_video_start_seconds(self, news_id: int, start_seconds: float):
         """Устанавливает время старта видео для новости."""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            cursor.execute("""
-                UPDATE user_news 
-                SET video_start_seconds = ? 
-                WHERE id = ?
-            """, (start_seconds, news_id))
-            
-            conn.commit()
-            conn.close()
+            with self._write_transaction() as conn:
+                conn.execute("""
+                    UPDATE user_news 
+                    SET video_start_seconds = ? 
+                    WHERE id = ?
+                """, (start_seconds, news_id))
             
             logger.info(f"Установлено время старта видео для новости {news_id}: {start_seconds}с")
             return True
@@ -296,8 +527,8 @@ class NewsTelegramBot:
         logger.info(f"🔄 Обработка сообщения из канала: {message_text[:100]}...")
 
         # Проверка на URL
-        url_pattern = r'https?://[^\s]+'
-        urls = re.findall(url_pattern, message_text)
+        # Сканирование останавливается после первых MAX_URLS_PER_MESSAGE совпадений
+        urls = [m.group(0) for m in itertools.islice(URL_RE.finditer(message_text), MAX_URLS_PER_MESSAGE)]
 
         if not urls:
             # Если нет ссылок, возможно это просто текст новости
@@ -308,7 +539,7 @@ class NewsTelegramBot:
             return
 
         # Обработка каждой ссылки из канала
-        for url in urls[:3]:  # Максимум 3 ссылки за раз
+        for url in urls:
             try:
                 await self._process_channel_news_url(url, user_id, chat_id)
             except Exception as e:
@@ -319,20 +550,22 @@ class NewsTelegramBot:
         logger.info(f"🌐 Обработка URL из канала: {url}")
 
         # Проверка на дубликат
-        if self._is_url_already_processed(url):
+        if await asyncio.to_thread(self._is_url_already_processed, url):
             logger.info(f"📋 URL уже обработан ранее: {url}")
             return
 
         try:
             # Парсинг веб-страницы через движки
-            parsed_data = await self._parse_url_with_engines(url)
+            parsed_data = await asyncio.to_thread(self._parse_url_with_engines, url)
 
             if not parsed_data or not parsed_data.get('title'):
                 logger.error(f"❌ Не удалось спарсить новость: {url}")
                 return
 
             # Сохранение в базу данных
-            news_id = self._save_parsed_news(parsed_data, user_id, chat_id)
+            news_id = await asyncio.to_thread(self._save_parsed_news, parsed_data, user_id, chat_id)
+            if news_id is None:
+                return
             logger.info(f"✅ Новость сохранена в БД (ID: {news_id}): {parsed_data['title'][:50]}...")
 
             # Отправка статуса в канал публикации
@@ -357,7 +590,8 @@ class NewsTelegramBot:
         try:
             # Создание базовой новости из текста
             news_data = {
-                'url': f'channel_text_{int(time.time())}',
+                # Наносекунды: тексты, пришедшие в одну секунду, не конфликтуют по URL
+                'url': f'channel_text_{time.time_ns()}',
                 'title': message_text[:100] + ('...' if len(message_text) > 100 else ''),
                 'description': message_text,
                 'source': 'Channel Message',
@@ -365,28 +599,67 @@ class NewsTelegramBot:
             }
 
             # Сохранение в базу данных
-            news_id = self._save_parsed_news(news_data, user_id, chat_id)
+            news_id = await asyncio.to_thread(self._save_parsed_news, news_data, user_id, chat_id)
+            if news_id is None:
+                return
             logger.info(f"✅ Текстовая новость сохранена в БД (ID: {news_id})")
 
         except Exception as e:
             logger.error(f"❌ Ошибка обработки текста из канала: {e}")
 
     def _notify_group_on_video(self, news_id: int, title: str, videos: list[str]):
-        """Сервисное уведомление в админ-группу о найденном видео и просьба указать старт."""
-        try:
-            if not self.publish_group_id or not self.publish_bot_token or not videos:
+        """Сервисное уведомление в админ-группу о найденном видео и просьба указать старт.
+
+        Уведомления копятся в буфере и уходят одним сообщением в фоновом потоке,
+        поэтому вызов не блокирует event loop и не упирается в лимиты Telegram.
+        """
+        if not self.publish_group_id or not self.publish_bot_token or not videos:
+            return
+        preview = videos[0][:80] + ('...' if len(videos[0]) > 80 else '')
+        entry = f"🎬 Готовим новость ID {news_id}: {title[:64]}\nВидео найдено: {preview}"
+        with self._notify_lock:
+            self._notify_buffer.append(entry)
+            if len(self._notify_buffer) >= NOTIFY_BATCH_MAX_ITEMS:
+                self._notify_wakeup.set()
+            if self._notify_flush_scheduled:
                 return
-            import requests
-            preview = videos[0][:80] + ('...' if len(videos[0]) > 80 else '')
-            text = (
-                f"🎬 Готовим новость ID {news_id}: {title[:64]}\n"
-                f"Видео найдено: {preview}\n\n"
-                f"Укажите старт (в секундах) командой: /startat {news_id} <seconds>\n"
-                f"Напр.: /startat {news_id} 5 — начать с 5 секунды.\n"
-                f"Оставьте как есть — будет 0 c."
-            )
+            self._notify_flush_scheduled = True
+        self._notify_executor.submit(self._flush_group_notifications)
+
+    def _flush_group_notifications(self):
+        """Отправляет накопленные уведомления (выполняется в фоновом потоке)"""
+        self._notify_wakeup.wait(NOTIFY_BATCH_INTERVAL)
+        with self._notify_lock:
+            entries = self._notify_buffer
+            self._notify_buffer = []
+            self._notify_flush_scheduled = False
+            self._notify_wakeup.clear()
+        for text in self._build_notification_messages(entries):
+            self._send_group_message(text)
+
+    @staticmethod
+    def _build_notification_messages(entries: list[str]) -> list[str]:
+        """Склеивает уведомления в сообщения, не превышая лимит длины Telegram"""
+        messages = []
+        current = []
+        length = len(VIDEO_NOTIFY_FOOTER)
+        for entry in entries:
+            if current and (length + len(entry) + 2 > TELEGRAM_MESSAGE_LIMIT
+                            or len(current) >= NOTIFY_BATCH_MAX_ITEMS):
+                messages.append('\n\n'.join(current + [VIDEO_NOTIFY_FOOTER]))
+                current = []
+                length = len(VIDEO_NOTIFY_FOOTER)
+            current.append(entry)
+            length += len(entry) + 2
+        if current:
+            messages.append('\n\n'.join(current + [VIDEO_NOTIFY_FOOTER]))
+        return messages
+
+    def _send_group_message(self, text: str):
+        """Отправка сообщения в админ-группу через общую HTTP-сессию"""
+        try:
             url = f"https://api.telegram.org/bot{self.publish_bot_token}/sendMessage"
-            resp = requests.post(url, json={
+            resp = self._http.post(url, json={
                 'chat_id': self.publish_group_id,
                 'text': text
             }, timeout=8)
@@ -402,9 +675,8 @@ class NewsTelegramBot:
         try:
             if not self.publish_group_id or not self.publish_bot_token:
                 return
-            import requests
             url = f"https://api.telegram.org/bot{self.publish_bot_token}/sendMessage"
-            resp = requests.post(url, json={
+            resp = self._http.post(url, json={
                 'chat_id': self.publish_group_id,
                 'text': '✅ Monitor online. Сервисные уведомления активны.'
             }, timeout=8)
@@ -424,32 +696,16 @@ class NewsTelegramBot:
             await self._handle_channel_message(message_text, user_id, chat_id)
             return
 
-        # Команда из админ-группы для установки старта видео
-        if self.publish_group_id and chat_id == self.publish_group_id and message_text.lower().startswith('/startat'):
-            try:
-                parts = message_text.split()
-                if len(parts) >= 3:
-                    news_id = int(parts[1])
-                    seconds = float(parts[2])
-                    with sqlite3.connect(self.db_path) as conn:
-                        conn.execute('UPDATE user_news SET video_start_seconds=? WHERE id=?', (seconds, news_id))
-                        conn.commit()
-                    await update.message.reply_text(f"✅ Старт для видео новости {news_id} установлен: {seconds} c")
-                    return
-                else:
-                    await update.message.reply_text("Использование: /startat <news_id> <seconds>")
-                    return
-            except Exception as e:
-                await update.message.reply_text(f"❌ Ошибка: {e}")
-                return
-
         # Проверка на URL
-        url_pattern = r'https?://[^\s]+'
-        urls = re.findall(url_pattern, message_text)
+        # Сканирование останавливается после первых MAX_URLS_PER_MESSAGE совпадений
+        urls = [m.group(0) for m in itertools.islice(URL_RE.finditer(message_text), MAX_URLS_PER_MESSAGE)]
 
         if not urls:
             # Если нет ссылок, возможно это просто текст новости
             if len(message_text) > 10:  # Минимум 10 символов для новости
+                if not self._take_rate_limit_slot(user_id):
+                    await update.message.reply_text(RATE_LIMIT_MESSAGE)
+                    return
                 await self._process_text_news(message_text, user_id, chat_id, update)
             else:
                 await update.message.reply_text(
@@ -462,22 +718,43 @@ class NewsTelegramBot:
             return
 
         # Обработка каждой ссылки
-        for url in urls[:3]:  # Максимум 3 ссылки за раз
+        for url in urls:
             try:
+                # Повторная ссылка не парсится и не расходует лимит пользователя
+                if await asyncio.to_thread(self._is_url_already_processed, url):
+                    await update.message.reply_text(
+                        f"📋 Эта ссылка уже была обработана ранее:\n{url}"
+                    )
+                    continue
+                if not self._take_rate_limit_slot(user_id):
+                    await update.message.reply_text(RATE_LIMIT_MESSAGE)
+                    return
                 await self._process_news_url(url, user_id, chat_id, update)
             except Exception as e:
                 logger.error(f"Ошибка обработки URL {url}: {e}")
                 await update.message.reply_text(f"❌ Ошибка обработки ссылки: {url}")
 
-    async def _process_news_url(self, url: str, user_id: int, chat_id: int, update: Update):
-        """Обработка URL новости с парсингом"""
+    def _take_rate_limit_slot(self, user_id: int) -> bool:
+        """Учитывает новую ссылку пользователя; False, если лимит за окно уже исчерпан"""
+        now = time.monotonic()
+        cutoff = now - RATE_LIMIT_WINDOW
+
+        # Редкая очистка пользователей, от которых давно ничего не было
+        if len(self._rate) > RATE_LIMIT_GC_THRESHOLD:
+            for uid in [uid for uid, times in self._rate.items() if not times or times[-1] < cutoff]:
+                del self._rate[uid]
+
+        times = self._rate[user_id]
+        while times and times[0] < cutoff:
+            times.popleft()
+        if len(times) >= RATE_LIMIT_MAX_LINKS:
+            logger.info(f"⏳ Пользователь {user_id} превысил лимит ссылок")
+            return False
+        times.append(now)
+        return True
 
-        # Проверка на дубликат
-        if self._is_url_already_processed(url):
-            await update.message.reply_text(
-                f"📋 Эта ссылка уже была обработана ранее:\n{url}"
-            )
-            return
+    async def _process_news_url(self, url: str, user_id: int, chat_id: int, update: Update):
+        """Обработка URL новости с парсингом (проверку на дубликат выполняет вызывающий)"""
 
         # Отправка подтверждения о начале обработки
         await update.message.reply_text(
@@ -487,7 +764,7 @@ class NewsTelegramBot:
 
         try:
             # Парсинг веб-страницы через движки
-            parsed_data = self._parse_url_with_engines(url)
+            parsed_data = await asyncio.to_thread(self._parse_url_with_engines, url)
 
             if not parsed_data.get('success', False):
                 await update.message.reply_text(
@@ -496,7 +773,12 @@ class NewsTelegramBot:
                 )
 
             # Сохранение полной информации о новости
-            news_id = self._save_parsed_news(parsed_data, user_id, chat_id)
+            news_id = await asyncio.to_thread(self._save_parsed_news, parsed_data, user_id, chat_id)
+            if news_id is None:
+                await update.message.reply_text(
+                    f"📋 Эта ссылка уже была обработана ранее:\n{url}"
+                )
+                return
 
             # Подтверждение успешного парсинга
             success_msg = (
@@ -537,7 +819,7 @@ class NewsTelegramBot:
             }
 
             # Сохранение новости
-            news_id = self._save_parsed_news(news_data, user_id, chat_id)
+            news_id = await asyncio.to_thread(self._save_parsed_news, news_data, user_id, chat_id)
 
             await update.message.reply_text(
                 f"✅ Текстовая новость принята!\n\n"
@@ -555,27 +837,24 @@ class NewsTelegramBot:
 
     def _is_url_already_processed(self, url: str) -> bool:
         """Проверка, была ли ссылка уже обработана"""
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.execute(
-                'SELECT id FROM user_news WHERE url = ?',
-                (url,)
-            )
-            return cursor.fetchone() is not None
+        with self._read_connection() as conn:
+            return conn.execute(SQL_URL_EXISTS, (url,)).fetchone() is not None
 
-    def _save_parsed_news(self, news_data: Dict, user_id: int, chat_id: int) -> int:
-        """Сохранение полной информации о новости в расширенную БД"""
-        with sqlite3.connect(self.db_path) as conn:
-            try:
-                # ЗАГЛУШКА ДЛЯ ТЕСТИРОВАНИЯ: Удаляем существующую новость с таким же URL.
-                # Это позволяет повторно обрабатывать одну и ту же новость во время тестов.
-                url_to_check = news_data.get('url')
-                if url_to_check:
-                    conn.execute('DELETE FROM user_news WHERE url = ?', (url_to_check,))
-                    logger.info(f"Удалена старая запись для URL (тестовый режим): {url_to_check}")
+    def _save_parsed_news(self, news_data: Dict, user_id: int, chat_id: int) -> Optional[int]:
+        """Сохранение полной информации о новости в расширенную БД
+        
+        Returns:
+            ID новости или None, если новость с таким URL уже есть в БД
+        """
+        try:
+            with self._write_transaction() as conn:
+                # В режиме разработки новость с тем же URL перезаписывается, чтобы ее можно было
+                # обработать повторно; в рабочем режиме дубликат просто игнорируется.
+                insert_verb = 'INSERT OR REPLACE' if self._dev_overwrite else 'INSERT OR IGNORE'
 
                 # Сохранение основной информации о новости
-                cursor = conn.execute('''
-                    INSERT INTO user_news (
+                cursor = conn.execute(f'''
+                    {insert_verb} INTO user_news (
                         url, title, description, content, published_date, source,
                         content_type, user_id, chat_id, fact_check_score,
                         verification_status, images, videos, username, avatar_url, local_video_path, avatar_path
@@ -592,56 +871,59 @@ class NewsTelegramBot:
                     chat_id,
                     news_data.get('fact_verification', {}).get('accuracy_score'),
                     news_data.get('fact_verification', {}).get('verification_status'),
-                    '|'.join(news_data.get('images', [])),
-                    '|'.join(news_data.get('videos', [])),
+                    json.dumps(news_data.get('images', []), ensure_ascii=False),
+                    json.dumps(news_data.get('videos', []), ensure_ascii=False),
                     news_data.get('username', ''),  # Добавляем username для аватарки
                     news_data.get('avatar_url', ''),  # Добавляем URL аватарки
                     news_data.get('local_video_path', ''),  # Добавляем путь к локальному видео
                     news_data.get('avatar_path', '')  # Добавляем путь к аватарке
                 ))
 
+                if cursor.rowcount == 0:
+                    # URL уже сохранен (например, другим процессом между проверкой и записью)
+                    logger.info(f"📋 Новость с таким URL уже есть в БД: {news_data.get('url')}")
+                    return None
+
                 news_id = cursor.lastrowid
 
                 # Сохранение изображений
                 images = news_data.get('images', [])
-                for image_url in images:
-                    conn.execute('''
-                        INSERT INTO news_images (news_id, image_url)
-                        VALUES (?, ?)
-                    ''', (news_id, image_url))
+                conn.executemany('''
+                    INSERT INTO news_images (news_id, image_url)
+                    VALUES (?, ?)
+                ''', [(news_id, image_url) for image_url in images])
 
                 # Сохранение источников проверки фактов
                 verification_sources = news_data.get('verification_sources', [])
-                for source in verification_sources:
-                    conn.execute('''
-                        INSERT INTO fact_check_sources (
-                            news_id, source_url, source_title, confidence_score
-                        ) VALUES (?, ?, ?, ?)
-                    ''', (
+                conn.executemany('''
+                    INSERT INTO fact_check_sources (
+                        news_id, source_url, source_title, confidence_score
+                    ) VALUES (?, ?, ?, ?)
+                ''', [
+                    (
                         news_id,
                         source.get('uri', ''),
                         source.get('title', ''),
                         0.8  # Пока фиксированная уверенность
-                    ))
+                    ) for source in verification_sources
+                ])
 
-                conn.commit()
-                logger.info(f"Новость сохранена в БД с ID {news_id}")
+        except Exception as e:
+            logger.error(f"Ошибка сохранения новости: {e}")
+            raise
 
-                # Сервисное уведомление в группу, если есть видео
-                try:
-                    videos_list = news_data.get('videos') or []
-                    if isinstance(videos_list, str):
-                        videos_list = [v for v in videos_list.split(',') if v]
-                    if videos_list:
-                        self._notify_group_on_video(news_id, news_data.get('title',''), videos_list)
-                except Exception as e:
-                    logger.warning(f"Не удалось уведомить группу о видео: {e}")
-                return news_id
+        logger.info(f"Новость сохранена в БД с ID {news_id}")
 
-            except Exception as e:
-                conn.rollback()
-                logger.error(f"Ошибка сохранения новости: {e}")
-                raise
+        # Сервисное уведомление в группу, если есть видео (вне транзакции, чтобы не держать блокировку записи)
+        try:
+            videos_list = news_data.get('videos') or []
+            if isinstance(videos_list, str):
+                videos_list = [v for v in videos_list.split(',') if v]
+            if videos_list:
+                self._notify_group_on_video(news_id, news_data.get('title',''), videos_list)
+        except Exception as e:
+            logger.warning(f"Не удалось уведомить группу о видео: {e}")
+        return news_id
 
     def _save_user_news(self, url: str, user_id: int, chat_id: int) -> int:
         """Устаревший метод для совместимости - сохраняет базовую новость"""
@@ -656,7 +938,7 @@ class NewsTelegramBot:
 
     def mark_news_processed(self, news_id: int, title: str = None, description: str = None):
         """Отметить новость как обработанную"""
-        with sqlite3.connect(self.db_path) as conn:
+        with self._write_transaction() as conn:
             conn.execute('''
                 UPDATE user_news
                 SET processed = 1, processed_at = ?
@@ -684,103 +966,93 @@ class NewsTelegramBot:
                         WHERE id = ?
                     ''', update_values)
 
-            conn.commit()
+
+    @staticmethod
+    def _decode_media_list(value: Optional[str]) -> list:
+        """Список URL медиа из столбца images/videos (JSON; старые записи - через '|')"""
+        if not value or not isinstance(value, str):
+            return []
+        if value.startswith('['):
+            try:
+                return json_loads(value)
+            except ValueError:
+                pass
+        return list(filter(None, map(str.strip, value.split('|'))))
+
+    @staticmethod
+    def _with_local_media(urls: list, local_path: Optional[str]) -> list:
+        """Список медиа с добавленным локальным файлом; повторы убираются с сохранением порядка"""
+        if local_path:
+            urls = [*urls, local_path]
+        try:
+            return list(dict.fromkeys(urls))
+        except TypeError:
+            # Движки могут вернуть медиа словарями (URL + метаданные) - их оставляем как есть
+            return urls
 
     def get_pending_news(self, limit: int = 10) -> list:
         """Получение необработанных новостей с полной информацией"""
-        with sqlite3.connect(self.db_path) as conn:
-            conn.row_factory = sqlite3.Row
+        with self._read_connection() as conn:
 
-            # Получение основных данных новостей
-            news_cursor = conn.execute('''
+            # Получение основных данных новостей (медиа хранятся прямо в user_news).
+            # Строки разбираются по мере чтения курсора, без промежуточного списка sqlite3.Row.
+            news_list = []
+            for news_row in conn.execute('''
                 SELECT * FROM user_news
                 WHERE processed = 0
                 ORDER BY received_at ASC
                 LIMIT ?
-            ''', (limit,))
-
-            news_list = []
-            for news_row in news_cursor.fetchall():
+            ''', (limit,)):
                 news_dict = dict(news_row)
                 
                 # Маппинг полей БД к ожидаемым названиям
                 if 'published_date' in news_dict:
                     news_dict['published'] = news_dict['published_date']
                 
-                # Обработка медиа из БД
-                if 'images' in news_dict and news_dict['images']:
-                    news_dict['images'] = news_dict['images'].split(',') if news_dict['images'] else []
-                else:
-                    news_dict['images'] = []
-                    
-                if 'videos' in news_dict and news_dict['videos']:
-                    news_dict['videos'] = news_dict['videos'].split(',') if news_dict['videos'] else []
-                else:
-                    news_dict['videos'] = []
-
-                # Получение изображений для новости (из БД + из news_images таблицы)
-                images_cursor = conn.execute('''
-                    SELECT image_url, local_path, downloaded
-                    FROM news_images
-                    WHERE news_id = ?
-                    ORDER BY id ASC
-                ''', (news_dict['id'],))
-
-                # Объединяем изображения из БД и из news_images таблицы
-                db_images = news_dict.get('images', [])
-                table_images = [
-                    {
-                        'url': img['image_url'],
-                        'local_path': img['local_path'],
-                        'downloaded': img['downloaded']
-                    } for img in images_cursor.fetchall()
-                ]
-                
-                # Если есть изображения в таблице, используем их, иначе используем из БД
-                if table_images:
-                    news_dict['images'] = [img['url'] for img in table_images if img['url']]
-                else:
-                    news_dict['images'] = db_images
+                # Обработка медиа из БД (news_images дублирует images и читается только для обслуживания)
+                news_dict['images'] = self._decode_media_list(news_dict.get('images'))
+                news_dict['videos'] = self._decode_media_list(news_dict.get('videos'))
 
-                # Добавляем пути к локальным файлам медиа
-                if 'local_video_path' in news_dict and news_dict['local_video_path']:
-                    # Если есть локальное видео, добавляем его в список видео
-                    if news_dict['local_video_path'] not in news_dict['videos']:
-                        news_dict['videos'].append(news_dict['local_video_path'])
+                # Добавляем пути к локальным файлам медиа (локальное видео - в список видео)
+                news_dict['videos'] = self._with_local_media(news_dict['videos'], news_dict.get('local_video_path'))
                 
                 # Аватарка уже доступна через news_dict['avatar_path']
 
-                # Получение источников проверки фактов
-                sources_cursor = conn.execute('''
-                    SELECT source_url, source_title, confidence_score
-                    FROM fact_check_sources
-                    WHERE news_id = ?
-                    ORDER BY confidence_score DESC
-                ''', (news_dict['id'],))
-
-                news_dict['verification_sources'] = [
-                    {
-                        'url': src['source_url'],
-                        'title': src['source_title'],
-                        'confidence': src['confidence_score']
-                    } for src in sources_cursor.fetchall()
-                ]
-
                 news_list.append(news_dict)
 
+            if not news_list:
+                return []
+
+            # Источники проверки для всех новостей пачки - одним запросом
+            news_ids = [news_dict['id'] for news_dict in news_list]
+            placeholders = ','.join('?' * len(news_ids))
+
+            # Обычные кортежи вместо sqlite3.Row: поля разбираются распаковкой, без поиска по имени
+            sources_cursor = conn.cursor()
+            sources_cursor.row_factory = None
+            sources = defaultdict(list)
+            for src_news_id, source_url, source_title, confidence_score in sources_cursor.execute(f'''
+                SELECT news_id, source_url, source_title, confidence_score
+                FROM fact_check_sources
+                WHERE news_id IN ({placeholders})
+                ORDER BY news_id, confidence_score DESC
+            ''', news_ids):
+                sources[src_news_id].append({
+                    'url': source_url,
+                    'title': source_title,
+                    'confidence': confidence_score
+                })
+
+            for news_dict in news_list:
+                news_dict['verification_sources'] = sources[news_dict['id']]
+
             return news_list
 
     def get_news_by_id(self, news_id: int) -> Dict:
         """Получение конкретной новости по ID"""
-        with sqlite3.connect(self.db_path) as conn:
-            conn.row_factory = sqlite3.Row
-            
-            cursor = conn.execute('''
-                SELECT * FROM user_news
-                WHERE id = ?
-            ''', (news_id,))
+        with self._read_connection() as conn:
             
-            news_row = cursor.fetchone()
+            news_row = conn.execute(SQL_GET_NEWS_BY_ID, (news_id,)).fetchone()
             if not news_row:
                 return None
                 
@@ -790,58 +1062,13 @@ class NewsTelegramBot:
             if 'published_date' in news_dict:
                 news_dict['published'] = news_dict['published_date']
             
-            # Обработка медиа из БД - сначала проверяем поле images в user_news
-            if 'images' in news_dict and news_dict['images']:
-                # Если есть изображения в поле images, используем их
-                if isinstance(news_dict['images'], str):
-                    # Разбиение по разделителю |
-                    news_dict['images'] = [url.strip() for url in news_dict['images'].split('|') if url.strip()]
-                else:
-                    news_dict['images'] = []
-            else:
-                news_dict['images'] = []
-                
-            if 'videos' in news_dict and news_dict['videos']:
-                # Умное разбиение URL видео - ищем полные URL
-                if isinstance(news_dict['videos'], str):
-                    # Разбиение по разделителю |
-                    news_dict['videos'] = [url.strip() for url in news_dict['videos'].split('|') if url.strip()]
-                else:
-                    news_dict['videos'] = []
-            else:
-                news_dict['videos'] = []
-            
-            # Если нет изображений в поле images, получаем из таблицы news_images
-            if not news_dict['images']:
-                images_cursor = conn.execute('''
-                    SELECT image_url, local_path, downloaded
-                    FROM news_images
-                    WHERE news_id = ?
-                    ORDER BY id ASC
-                ''', (news_id,))
-                
-                news_dict['images'] = [
-                {
-                    'url': img['image_url'],
-                    'local_path': img['local_path'],
-                    'downloaded': img['downloaded']
-                } for img in images_cursor.fetchall()
-            ]
+            # Обработка медиа из БД: JSON-списки в user_news - единственный источник при чтении
+            news_dict['images'] = self._decode_media_list(news_dict.get('images'))
+            news_dict['videos'] = self._decode_media_list(news_dict.get('videos'))
             
             # Добавляем пути к локальным файлам медиа (как в get_pending_news)
-            if 'local_video_path' in news_dict and news_dict['local_video_path']:
-                # Если есть локальное видео, добавляем его в список видео
-                if news_dict['local_video_path'] not in news_dict['videos']:
-                    news_dict['videos'].append(news_dict['local_video_path'])
-                    
-            # Добавляем локальные пути к изображениям если они есть
-            if 'local_image_path' in news_dict and news_dict['local_image_path']:
-                # Если есть локальное изображение, добавляем его в список изображений
-                if isinstance(news_dict['images'], list):
-                    if news_dict['local_image_path'] not in news_dict['images']:
-                        news_dict['images'].append(news_dict['local_image_path'])
-                else:
-                    news_dict['images'] = [news_dict['local_image_path']]
+            news_dict['videos'] = self._with_local_media(news_dict['videos'], news_dict.get('local_video_path'))
+            news_dict['images'] = self._with_local_media(news_dict['images'], news_dict.get('local_image_path'))
             
             # Аватарка уже доступна через news_dict['avatar_path']
             
@@ -849,14 +1076,19 @@ class NewsTelegramBot:
 
     def mark_video_created(self, news_id: int, video_url: str = None):
         """Отметить, что видео создано для новости"""
-        with sqlite3.connect(self.db_path) as conn:
-            conn.execute('''
-                UPDATE user_news
-                SET video_created = 1, video_url = ?
-                WHERE id = ?
-            ''', (video_url, news_id))
-            conn.commit()
-            logger.info(f"Видео отмечено как созданное для новости {news_id}")
+        self.mark_videos_created([(video_url, news_id)])
+
+    def mark_videos_created(self, pairs: list[tuple[Optional[str], int]]):
+        """Отметить созданные видео пачкой (пары video_url, news_id) - одна транзакция на всю пачку.
+
+        Внутри проекта вызывается только через mark_video_created; пакетный вызов - для внешнего кода,
+        создающего несколько видео за раз (оркестратор обрабатывает новости по одной).
+        """
+        if not pairs:
+            return
+        with self._write_transaction() as conn:
+            conn.executemany(SQL_MARK_VIDEO_CREATED, pairs)
+        logger.info(f"Видео отмечено как созданное для новостей: {', '.join(str(news_id) for _, news_id in pairs)}")
 
     async def _trigger_news_processing(self, news_id: int, url: str):
         """Триггер обработки новости (заглушка для будущего использования)"""
@@ -866,8 +1098,8 @@ class NewsTelegramBot:
         # Имитация обработки
         await asyncio.sleep(2)
 
-        # Отметка как обработанная
-        self.mark_news_processed(news_id, "Обработанная новость", "Описание новости")
+        # Отметка как обработанная (в потоке, чтобы не блокировать цикл на время записи)
+        await asyncio.to_thread(self.mark_news_processed, news_id, "Обработанная новость", "Описание новости")
 
         logger.info(f"Новость {news_id} отмечена как обработанная")
 
@@ -890,18 +1122,42 @@ class NewsTelegramBot:
         application.add_handler(CommandHandler("startat", self.startat_command))
         application.add_handler(MessageHandler(filters.TEXT | filters.COMMAND, self.handle_message))
 
-        # Запуск бота
-        logger.info("✅ Бот запущен и готов к работе")
-        logger.info("Для остановки нажмите Ctrl+C")
+        webhook_config = self.telegram_config.get('webhook') or {}
+        webhook_url = webhook_config.get('url')
+
+        # run_polling()/run_webhook() сами запускают событийный цикл, поэтому внутри
+        # уже работающего цикла приложение запускается и останавливается вручную
+        async with application:
+            await application.start()
+            if webhook_url:
+                # Webhook: Telegram сам присылает обновления, без постоянных запросов getUpdates
+                await application.updater.start_webhook(
+                    listen=webhook_config.get('listen', '0.0.0.0'),
+                    port=int(webhook_config.get('port', 8443)),
+                    url_path=urlsplit(webhook_url).path.lstrip('/'),
+                    webhook_url=webhook_url,
+                    secret_token=os.getenv('TELEGRAM_WEBHOOK_SECRET') or None,
+                    allowed_updates=Update.ALL_TYPES
+                )
+                logger.info(f"🌐 Получение обновлений через webhook: {webhook_url}")
+            else:
+                await application.updater.start_polling(allowed_updates=Update.ALL_TYPES)
+
+            # Запуск бота
+            logger.info("✅ Бот запущен и готов к работе")
+            logger.info("Для остановки нажмите Ctrl+C")
 
-        # Простой запуск без обработки исключений
-        await application.run_polling(allowed_updates=Update.ALL_TYPES)
+            try:
+                await asyncio.Event().wait()
+            finally:
+                await application.updater.stop()
+                await application.stop()
 
-    def _parse_url_with_engines(self, url: str) -> Dict[str, Any]:
+    def _parse_url_with_engines(self, url: str) -> ParseResult:
         """Парсинг URL через движки новостных источников"""
         try:
             # Проверяем, может ли какой-то движок обработать URL
-            engine = self.engine_registry.get_engine_for_url(url)
+            engine = self.engine_registry.get_engine_for_url(url, self.config)
             if engine:
                 logger.info(f"🎯 Используем движок {engine.__class__.__name__} для URL: {url}")
                 result = engine.parse_url(url)
@@ -942,7 +1198,7 @@ After=network.target
 [Service]
 Type=simple
 User={os.getenv('USER', 'www-data')}
-WorkingDirectory={os.path.dirname(os.path.abspath(__file__))}/..
+WorkingDirectory={_SCRIPT_DIR}/..
 ExecStart={sys.executable} scripts/telegram_bot.py
 Restart=always
 RestartSec=10
@@ -982,7 +1238,7 @@ def main():
 
     # Определение пути к конфигу
     if not os.path.isabs(args.config):
-        config_path = os.path.join(os.path.dirname(__file__), args.config)
+        config_path = os.path.join(_SCRIPT_DIR, args.config)
     else:
         config_path = args.config
 
@@ -990,9 +1246,12 @@ def main():
         logger.error(f"Файл конфигурации не найден: {config_path}")
         sys.exit(1)
 
+    bot = None
     try:
         # Создание и запуск бота
         bot = NewsTelegramBot(config_path)
+        if uvloop is not None:
+            asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
         asyncio.run(bot.run_bot())
 
     except KeyboardInterrupt:
@@ -1000,6 +1259,10 @@ def main():
     except Exception as e:
         logger.error(f"Критическая ошибка: {e}")
         sys.exit(1)
+    finally:
+        # Соединения с БД открыты на все время работы бота - закрываем их при выходе
+        if bot is not None:
+            bot.close()
 
 if __name__ == "__main__":
     main()
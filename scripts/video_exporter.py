@@ -4,16 +4,23 @@
 """
 
 import os
+import re
+import hashlib
+import atexit
 import json
 import logging
+import random
 import time
 from pathlib import Path
-from typing import Dict, Optional, List, Tuple, Any
+from typing import Callable, ClassVar, Dict, Iterable, Iterator, Optional, List, Tuple, Any
 import yaml
 from datetime import datetime
-import base64
+# SIMD-декодер base64 для кадров CDP, если установлен
+try:
+    from pybase64 import b64decode
+except ImportError:
+    from base64 import b64decode
 
-from PIL import Image, ImageDraw, ImageFont, ImageFilter
 import numpy as np
 from moviepy import (
     ColorClip, CompositeVideoClip, ImageClip, VideoFileClip, AudioFileClip,
@@ -26,8 +33,11 @@ from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
-import io
+import itertools
+import queue
 import subprocess
+import threading
+from collections import deque
 
 import tempfile
 import shutil
@@ -36,6 +46,69 @@ import shutil
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# Сколько ждать события seeked при перемотке видео перед снимком кадра
+SEEK_TIMEOUT_MS = 1000
+
+# Сколько последних строк stderr ffmpeg сохранять для сообщения об ошибке
+FFMPEG_STDERR_TAIL_LINES = 20
+
+# Шаблоны повторно раскладывают текст через 200 мс после загрузки шрифтов - ждем чуть дольше
+PAGE_LAYOUT_SETTLE_MS = 250
+# Предел ожидания готовности страницы (шрифты и раскладка), секунды
+PAGE_READY_TIMEOUT_SECONDS = 10
+
+# Сколько захваченных кадров может ждать записи в stdin ffmpeg
+FRAME_QUEUE_SIZE = 8
+
+# Плейсхолдер шаблона вида {{NEWS_TITLE}}
+PLACEHOLDER_PATTERN = re.compile(r'\{\{[A-Z_]+\}\}')
+
+# Сколько свободных Chrome WebDriver держать для повторного использования
+DRIVER_POOL_SIZE = 2
+
+# Аппаратные H.264 кодировщики ffmpeg в порядке предпочтения и их параметры
+# (у каждого свои имена пресетов и поддерживаемые форматы пикселей)
+HW_VIDEO_ENCODERS = {
+    'h264_nvenc': ['-preset', 'p4', '-b:v', '6M', '-pix_fmt', 'yuv420p'],
+    'h264_videotoolbox': ['-b:v', '6M', '-pix_fmt', 'yuv420p'],
+    'h264_qsv': ['-preset', 'veryfast', '-b:v', '6M', '-pix_fmt', 'nv12'],
+}
+
+# Папка с фоновой музыкой
+MUSIC_DIR = 'resources/music'
+
+# Поддерживаемые форматы фоновой музыки (кортеж - для str.endswith)
+AUDIO_EXTENSIONS = ('.mp3', '.wav', '.ogg', '.m4a')
+
+# Каталог с логотипами источников
+LOGOS_DIR = 'resources/logos'
+
+# Маппинг известных источников на их логотипы
+SOURCE_LOGO_MAPPING = {
+    'nbc news': 'resources/logos/NBCNews.png',
+    'nbcnews': 'resources/logos/NBCNews.png',
+    'abc news': 'resources/logos/abc.png',
+    'abcnews': 'resources/logos/abc.png',
+    'reuters': 'resources/logos/Reuters.png',
+    'cnn': 'resources/logos/cnn.png',
+    'fox news': 'resources/logos/FoxNews.png',
+    'foxnews': 'resources/logos/FoxNews.png',
+    'washington post': 'resources/logos/WashingtonPost.png',
+    'washingtonpost': 'resources/logos/WashingtonPost.png',
+    'wall street journal': 'resources/logos/WSJ.png',
+    'wsj': 'resources/logos/WSJ.png',
+    'cnbc': 'resources/logos/CNBC.png',
+    'al jazeera': 'resources/logos/ALJAZEERA.png',
+    'aljazeera': 'resources/logos/ALJAZEERA.png',
+    'associated press': 'resources/logos/AssociatedPress.png',
+    'ap': 'resources/logos/AssociatedPress.png',
+    'financial times': 'resources/logos/Financial_Times_corporate_logo_(no_background).svg',
+    'ft': 'resources/logos/Financial_Times_corporate_logo_(no_background).svg',
+    'the hill': 'resources/logos/thehill.png',
+    'thehill': 'resources/logos/thehill.png',
+    'politico': 'resources/logos/politico.png',
+}
+
 # Импорт нашего модуля для логотипов
 try:
     from logo_manager import LogoManager
@@ -44,15 +117,149 @@ except ImportError:
     logger.warning("LogoManager не доступен")
 
 
+class FramePipeWriter:
+    """Пишет кадры в stdin ffmpeg из фонового потока.
+
+    Захват следующего кадра не ждет, пока ffmpeg освободит буфер канала: пока браузер
+    рендерит и снимает кадр, предыдущий уже уходит в кодировщик.
+    """
+
+    def __init__(self, stream, max_pending: int = FRAME_QUEUE_SIZE):
+        self._stream = stream
+        self._queue: queue.Queue = queue.Queue(maxsize=max_pending)
+        self.error: Optional[BaseException] = None
+        self._thread = threading.Thread(target=self._run, name='ffmpeg-frame-writer', daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            frame = self._queue.get()
+            if frame is None:
+                return
+            if self.error is None:
+                try:
+                    self._stream.write(frame)
+                except Exception as e:
+                    # Остальные кадры только вычитываются, чтобы не блокировать захват
+                    self.error = e
+
+    def write(self, frame: bytes):
+        """Ставит кадр в очередь; поднимает ошибку, если запись в ffmpeg уже упала"""
+        if self.error is not None:
+            raise self.error
+        self._queue.put(frame)
+
+    def close(self):
+        """Дожидается записи всех поставленных в очередь кадров"""
+        if self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join()
+
+
+class StderrDrain:
+    """Вычитывает stderr процесса в фоновом потоке.
+
+    Иначе при долгом кодировании канал stderr может заполниться, ffmpeg остановится на записи
+    в него и перестанет читать кадры из stdin. Строки уходят в debug-лог, последние хранятся
+    для текста ошибки.
+    """
+
+    def __init__(self, stream, tail_lines: int = FFMPEG_STDERR_TAIL_LINES):
+        self.tail: deque = deque(maxlen=tail_lines)
+        self._thread = threading.Thread(target=self._run, args=(stream,), name='ffmpeg-stderr', daemon=True)
+        self._thread.start()
+
+    def _run(self, stream):
+        for line in stream:
+            text = line.decode('utf-8', errors='replace').rstrip()
+            if text:
+                logger.debug(f"ffmpeg: {text}")
+                self.tail.append(text)
+
+    def join(self, timeout: float = 1.0) -> str:
+        """Дожидается конца потока stderr и возвращает его последние строки"""
+        self._thread.join(timeout)
+        return '\n'.join(self.tail)
+
+
 class VideoExporter:
     """Класс для экспорта анимаций в видео (старый метод через Selenium)"""
 
+    # Общий пул запущенных Chrome по размеру окна: новый экспортер берет готовый драйвер,
+    # а close() возвращает его сюда вместо quit()
+    _driver_pool: ClassVar[Dict[Tuple[int, int], List[webdriver.Chrome]]] = {}
+    _driver_pool_lock: ClassVar[threading.Lock] = threading.Lock()
+    _driver_pool_closed: ClassVar[bool] = False
+    # Результат поиска аппаратного кодировщика - проверяется один раз на процесс
+    _hw_encoder: ClassVar[Optional[str]] = None
+    _hw_encoder_checked: ClassVar[bool] = False
+
     def __init__(self, video_config: Dict, paths_config: Dict):
         self.video_config = video_config
         self.paths_config = paths_config
         self.driver = None
 
-        self._setup_selenium()
+        # Снимок каталога логотипов (имя в нижнем регистре -> имя файла) и логотипы из маппинга,
+        # файлы которых в нем есть - дальше проверки идут по памяти, без stat на каждый путь
+        self._logo_files = self._scan_logo_files()
+        self._logo_index = {
+            key: path for key, path in SOURCE_LOGO_MAPPING.items()
+            if os.path.basename(path).lower() in self._logo_files
+        }
+        self._logo_path_cache: Dict[str, str] = {}
+        # Содержимое HTML шаблонов по пути к файлу
+        self._template_cache: Dict[str, str] = {}
+        # Список треков фоновой музыки (None - папка еще не сканировалась)
+        self._music_files: Optional[List[str]] = None
+        # Кодек аудиодорожки по пути к файлу музыки (результат ffprobe)
+        self._audio_codec_cache: Dict[str, str] = {}
+        # Готовые AAC-фрагменты музыки по (путь к треку, длительность в мс)
+        self._music_fragments: Dict[Tuple[str, int], str] = {}
+        # Аппаратный кодировщик H.264 (None - libx264)
+        self._video_encoder = self._detect_hw_encoder() if self.video_config.get('hardware_encoder', True) else None
+
+        self.driver = self._take_pooled_driver()
+        if self.driver is None:
+            self._setup_selenium()
+        else:
+            logger.info("Selenium WebDriver взят из пула")
+
+    def _driver_pool_key(self) -> Tuple[int, int]:
+        return self.video_config['width'], self.video_config['height']
+
+    def _take_pooled_driver(self):
+        with self._driver_pool_lock:
+            drivers = self._driver_pool.get(self._driver_pool_key())
+            return drivers.pop() if drivers else None
+
+    def _release_driver(self, driver) -> bool:
+        """Возвращает драйвер в пул (с пустой страницей); False - если его нужно закрыть"""
+        try:
+            driver.get("about:blank")
+        except Exception as e:
+            logger.warning(f"WebDriver не отвечает, в пул не возвращаем: {e}")
+            return False
+        with self._driver_pool_lock:
+            if self._driver_pool_closed:
+                return False
+            drivers = self._driver_pool.setdefault(self._driver_pool_key(), [])
+            if len(drivers) >= DRIVER_POOL_SIZE:
+                return False
+            drivers.append(driver)
+            return True
+
+    @classmethod
+    def shutdown_driver_pool(cls):
+        """Закрывает все драйверы из пула (вызывается автоматически при выходе)"""
+        with cls._driver_pool_lock:
+            cls._driver_pool_closed = True
+            drivers = [driver for pooled in cls._driver_pool.values() for driver in pooled]
+            cls._driver_pool.clear()
+        for driver in drivers:
+            try:
+                driver.quit()
+            except Exception as e:
+                logger.warning(f"Ошибка закрытия WebDriver из пула: {e}")
 
     def _setup_selenium(self):
         """Настройка Selenium WebDriver для headless режима"""
@@ -83,12 +290,45 @@ class VideoExporter:
             })
             
             self.driver = webdriver.Chrome(options=chrome_options)
+            self.driver.set_script_timeout(PAGE_READY_TIMEOUT_SECONDS)
+            # DevTools Page API нужен для захвата кадров - включаем один раз на весь срок драйвера
+            try:
+                self.driver.execute_cdp_cmd("Page.enable", {})
+            except Exception as e:
+                logger.warning(f"Не удалось включить DevTools Page API: {e}")
             logger.info("Selenium WebDriver успешно инициализирован")
 
         except Exception as e:
             logger.error(f"Ошибка инициализации Selenium: {e}")
             raise
 
+    def _wait_for_page_ready(self):
+        """Ждет загрузки шрифтов и завершения раскладки страницы вместо фиксированной паузы.
+
+        Изображения к этому моменту уже загружены: driver.get возвращается после события load.
+        """
+        try:
+            self.driver.execute_async_script(
+                """
+                const done = arguments[arguments.length - 1];
+                const fontsReady = document.fonts ? document.fonts.ready : Promise.resolve();
+                fontsReady
+                    .then(() => new Promise((resolve) => setTimeout(resolve, %d)))
+                    .then(() => requestAnimationFrame(() => requestAnimationFrame(() => done(true))));
+                """ % PAGE_LAYOUT_SETTLE_MS
+            )
+        except Exception as e:
+            logger.warning(f"Не дождались готовности страницы, продолжаем захват: {e}")
+
+    def _load_template(self, template_path: str) -> str:
+        """Читает HTML шаблон с диска один раз и дальше отдает его из кэша"""
+        template = self._template_cache.get(template_path)
+        if template is None:
+            with open(template_path, 'r', encoding='utf-8') as f:
+                template = f.read()
+            self._template_cache[template_path] = template
+        return template
+
     def generate_html_from_template(self, animation_data: Dict, logo_path: Optional[str] = None) -> str:
         """Генерация HTML файла из шаблона с данными анимации"""
 
@@ -97,8 +337,7 @@ class VideoExporter:
             'animation_template.html'
         )
 
-        with open(template_path, 'r', encoding='utf-8') as f:
-            template = f.read()
+        template = self._load_template(template_path)
 
         js_data = {
             'header': animation_data.get('animation_content', {}).get('header', {}),
@@ -144,13 +383,18 @@ class VideoExporter:
             logger.error(f"Ошибка при рендеринге видео: {e}")
             raise
 
-    def _capture_animation_frames(self) -> list:
-        """Захват кадров анимации с синхронизацией через DevTools (fallback на старый метод)."""
+    def _capture_animation_frames(self, write_frame: Callable[[bytes], Any]) -> int:
+        """Захват кадров анимации с синхронизацией через DevTools (fallback на старый метод).
+
+        Каждый кадр (JPEG) сразу передается в write_frame - обычно это stdin ffmpeg.
+        Возвращает количество переданных кадров.
+        """
         fps = self.video_config.get('fps', 20)  # Снижен с 24 до 20 для ускорения захвата
         duration = self.video_config.get('duration_seconds', 6)  # 6 секунд видео
         num_frames = int(duration * fps)
         logger.info(f"Захватываем {num_frames} кадров за {duration} секунд с FPS {fps} с синхронизацией видео.")
 
+        frames_written = 0
         try:
             video_element = WebDriverWait(self.driver, 5).until(
                 EC.presence_of_element_located((By.ID, "newsCardVideo"))
@@ -180,74 +424,85 @@ class VideoExporter:
                 raise ValueError("Не удалось определить область видео для скриншота")
 
             dpr = metrics['dpr']
+            # Целочисленная область и масштаб под ширину видео: скриншот приходит уже нужного
+            # размера, и scale в ffmpeg не пересэмплирует кадр из-за дробных пикселей
+            clip_width = max(round(metrics['width'] * dpr), 1)
+            clip_height = max(round(metrics['height'] * dpr), 1)
             clip = {
-                "x": metrics['x'] * dpr,
-                "y": metrics['y'] * dpr,
-                "width": metrics['width'] * dpr,
-                "height": metrics['height'] * dpr,
-                "scale": 1
+                "x": max(round(metrics['x'] * dpr), 0),
+                "y": max(round(metrics['y'] * dpr), 0),
+                "width": clip_width,
+                "height": clip_height,
+                "scale": self.video_config['width'] / clip_width
             }
 
             self.driver.execute_script("arguments[0].pause();", video_element)
-            # Включаем DevTools Page API (идемпотентно)
-            try:
-                self.driver.execute_cdp_cmd("Page.enable", {})
-            except Exception:
-                pass
-
-            frames: List[np.ndarray] = []
+            # Перемотка, которая завершается только после события seeked (или по таймауту,
+            # если видео нет или перемотка зависла) - кадр снимается уже после перемотки.
+            # CSS-анимации ставятся на паузу и выставляются на то же время t, что и видео,
+            # поэтому каждый кадр детерминирован и не зависит от скорости захвата
+            self.driver.execute_script(
+                """
+                window.__seekAndReady = (t) => new Promise((resolve) => {
+                    for (const animation of document.getAnimations()) {
+                        animation.pause();
+                        animation.currentTime = t * 1000;
+                    }
+                    const video = document.getElementById('newsCardVideo');
+                    if (!video || video.readyState < 1) { resolve(false); return; }
+                    const timer = setTimeout(() => resolve(false), %d);
+                    video.addEventListener('seeked', () => { clearTimeout(timer); resolve(true); }, { once: true });
+                    video.currentTime = t;
+                });
+                """ % SEEK_TIMEOUT_MS
+            )
 
             for i in range(num_frames):
                 current_time = i / fps
 
-                # Быстрая установка времени без явного ожидания seek
-                self.driver.execute_script(
-                    """
-                    const video = arguments[0];
-                    video.currentTime = arguments[1];
-                    """,
-                    video_element, current_time
+                # Runtime.evaluate напрямую через DevTools, с ожиданием Promise перемотки
+                self.driver.execute_cdp_cmd(
+                    "Runtime.evaluate",
+                    {
+                        "expression": f"window.__seekAndReady({current_time})",
+                        "awaitPromise": True,
+                        "returnByValue": True
+                    }
                 )
 
-                # Небольшая пауза только для первого кадра, остальные без задержки
-                if i == 0:
-                    time.sleep(0.1)
-
                 screenshot_data = self.driver.execute_cdp_cmd(
                     "Page.captureScreenshot",
                     {
                         "format": "jpeg",
                         "quality": 90,
-                        "clip": clip
+                        "clip": clip,
+                        # Быстрый кодировщик JPEG в браузере: кадр все равно перекодируется в H.264
+                        "optimizeForSpeed": True
                     }
                 )
 
-                jpeg_bytes = base64.b64decode(screenshot_data['data'])
-                frame_bgr = cv2.imdecode(np.frombuffer(jpeg_bytes, np.uint8), cv2.IMREAD_COLOR)
-                if frame_bgr is None:
-                    raise ValueError("cv2.imdecode вернул None")
-
-                frame_rgb = cv2.cvtColor(frame_bgr, cv2.COLOR_BGR2RGB)
-                if (frame_rgb.shape[1], frame_rgb.shape[0]) != (self.video_config['width'], self.video_config['height']):
-                    frame_rgb = cv2.resize(
-                        frame_rgb,
-                        (self.video_config['width'], self.video_config['height']),
-                        interpolation=cv2.INTER_AREA
-                    )
-
-                frames.append(frame_rgb)
+                # JPEG уходит в ffmpeg как есть: декодирование и масштабирование делает кодировщик
+                write_frame(b64decode(screenshot_data['data']))
+                frames_written += 1
 
-            logger.info(f"Захвачено {len(frames)} кадров с точной видеосинхронизацией (DevTools).")
-            return frames
+            logger.info(f"Захвачено {frames_written} кадров с точной видеосинхронизацией (DevTools).")
+            return frames_written
 
         except Exception as e:
+            if frames_written:
+                # Часть кадров уже в кодировщике - начать поток заново другим способом нельзя
+                raise
             logger.warning(f"DevTools скриншоты недоступны, возвращаемся к headless-снимкам: {e}")
-            return self._capture_frames_via_screenshot(num_frames, fps)
+            return self._capture_frames_via_screenshot(num_frames, fps, write_frame)
 
-    def _capture_frames_via_screenshot(self, num_frames: int, fps: int) -> List[np.ndarray]:
-        """Резервный метод захвата кадров c полным скриншотом окна."""
-        frames: List[np.ndarray] = []
+    def _capture_frames_via_screenshot(self, num_frames: int, fps: int,
+                                       write_frame: Callable[[bytes], Any]) -> int:
+        """Резервный метод захвата кадров c полным скриншотом окна.
 
+        Кадр снимается через DevTools в JPEG; если DevTools недоступен уже на первом кадре,
+        весь поток идет PNG-скриншотами WebDriver (формат в image2pipe менять на ходу нельзя).
+        """
+        use_cdp = True
         for i in range(num_frames):
             current_time = i / fps
             self.driver.execute_script(
@@ -261,27 +516,238 @@ class VideoExporter:
             )
             time.sleep(1 / max(fps * 2, 1))
 
-            screenshot = self.driver.get_screenshot_as_png()
-            image = Image.open(io.BytesIO(screenshot))
-            if image.size != (self.video_config['width'], self.video_config['height']):
-                image = image.resize((self.video_config['width'], self.video_config['height']))
-            frames.append(np.array(image))
+            frame = None
+            if use_cdp:
+                try:
+                    screenshot_data = self.driver.execute_cdp_cmd(
+                        "Page.captureScreenshot",
+                        {"format": "jpeg", "quality": 90, "optimizeForSpeed": True}
+                    )
+                    frame = b64decode(screenshot_data['data'])
+                except Exception as e:
+                    if i:
+                        raise
+                    logger.warning(f"DevTools скриншот недоступен, используем PNG: {e}")
+                    use_cdp = False
+            if frame is None:
+                frame = self.driver.get_screenshot_as_png()
+
+            write_frame(frame)
+
+        logger.info(f"Захвачено {num_frames} кадров с точной видеосинхронизацией (fallback).")
+        return num_frames
+
+    def _start_frame_encoder(self, output_path: str, fps: int, music_path: Optional[str] = None,
+                             input_args: Optional[List[str]] = None,
+                             duration_seconds: Optional[float] = None) -> subprocess.Popen:
+        """Запускает ffmpeg, который кодирует в H.264 кадры из stdin.
+
+        По умолчанию кадры - изображения (JPEG/PNG); input_args задает другой формат входа,
+        например сырые кадры rawvideo. Кадры приводятся к размеру видео из конфига; если есть
+        музыка, она добавляется сразу, без промежуточного файла без звука. Известная длительность
+        видео обрезает музыку через -t, и ffmpeg не дочитывает трек до конца.
+        """
+        width, height = self.video_config['width'], self.video_config['height']
+        if input_args is None:
+            # Формат кадров (JPEG или PNG) ffmpeg определяет по первому кадру
+            input_args = ['-f', 'image2pipe']
+        command = [
+            'ffmpeg',
+            '-y',
+            '-loglevel', 'error',
+            *input_args,
+            '-framerate', str(fps),
+            '-i', '-'
+        ]
+
+        actual_music_path = music_path.replace('../', '') if music_path else ''
+        has_music = bool(actual_music_path) and os.path.exists(actual_music_path)
+        if has_music:
+            logger.info(f"🎵 Добавляем аудиодорожку '{actual_music_path}' при кодировании")
+            if duration_seconds:
+                actual_music_path = self._prepare_music_fragment(actual_music_path, duration_seconds)
+            command += ['-i', actual_music_path]
+        elif music_path:
+            logger.warning(f"⚠️ Файл музыки не найден: '{actual_music_path}', видео будет без звука.")
+        else:
+            logger.info("🎶 Музыка не выбрана, видео будет без звука.")
+
+        command += ['-vf', f'scale={width}:{height}:flags=area']
+        command += self._video_codec_args(fps)
+        if has_music:
+            command += self._audio_codec_args(actual_music_path)
+            if duration_seconds:
+                command += ['-t', f'{duration_seconds:.3f}']
+            else:
+                command.append('-shortest')
+        command.append(output_path)
+
+        encoder = subprocess.Popen(command, stdin=subprocess.PIPE, stderr=subprocess.PIPE)
+        encoder.stderr_drain = StderrDrain(encoder.stderr)
+        return encoder
+
+    def _video_codec_args(self, fps: int) -> List[str]:
+        """Параметры видеокодека ffmpeg: аппаратный кодировщик, если найден, иначе libx264.
+
+        Ключевой кадр - раз в секунду; пресет и CRF libx264 задаются в конфиге видео.
+        """
+        gop_args = ['-g', str(fps)]
+        if self._video_encoder:
+            return ['-c:v', self._video_encoder, *HW_VIDEO_ENCODERS[self._video_encoder], *gop_args]
+        return [
+            '-c:v', 'libx264',
+            '-preset', str(self.video_config.get('encoder_preset', 'ultrafast')),
+            '-crf', str(self.video_config.get('encoder_crf', 23)),
+            *gop_args,
+            '-threads', '0',
+            '-pix_fmt', 'yuv420p'
+        ]
 
-        logger.info(f"Захвачено {len(frames)} кадров с точной видеосинхронизацией (fallback).")
-        return frames
+    def _prepare_music_fragment(self, music_path: str, duration_seconds: float) -> str:
+        """Возвращает AAC-фрагмент музыки нужной длительности (создается один раз и переиспользуется).
 
-    def _create_video_from_frames(self, frames: list, output_path: str) -> str:
-        """Создание видео файла из кадров"""
-        height, width, _ = cv2.cvtColor(np.array(frames[0]), cv2.COLOR_RGB2BGR).shape
-        # Используем кодек avc1 (H.264), он более совместим, чем mp4v
-        fourcc = cv2.VideoWriter_fourcc(*'avc1')
-        video_writer = cv2.VideoWriter(output_path, fourcc, self.video_config['fps'], (width, height))
+        Трек декодируется и кодируется один раз на пару (файл, длительность), а при кодировании
+        каждого шорта фрагмент только копируется. Если фрагмент создать не удалось - исходный трек.
+        """
+        key = (music_path, round(duration_seconds * 1000))
+        fragment_path = self._music_fragments.get(key)
+        # Фрагмент мог быть удален вместе с temp_dir - тогда создаем его заново
+        if fragment_path and os.path.exists(fragment_path):
+            return fragment_path
+
+        try:
+            stat = os.stat(music_path)
+            # Имя зависит от пути, размера и времени изменения трека - измененный трек даст новый фрагмент
+            digest = hashlib.sha1(f"{os.path.abspath(music_path)}|{stat.st_size}|{stat.st_mtime_ns}".encode()).hexdigest()[:12]
+            fragments_dir = Path(self.paths_config.get('temp_dir', 'temp')) / 'music_fragments'
+            fragments_dir.mkdir(parents=True, exist_ok=True)
+            fragment_path = str(fragments_dir / f"music_{key[1]}ms_{digest}.m4a")
+
+            if not os.path.exists(fragment_path):
+                # Пишем во временный файл и переименовываем: оборванный фрагмент не попадет в кэш
+                partial_path = f"{fragment_path[:-len('.m4a')]}.part.m4a"
+                subprocess.run(
+                    ['ffmpeg', '-y', '-loglevel', 'error', '-i', music_path,
+                     '-t', f'{duration_seconds:.3f}', '-vn', '-c:a', 'aac', '-b:a', '128k', partial_path],
+                    check=True, capture_output=True, timeout=120
+                )
+                os.replace(partial_path, fragment_path)
+                logger.info(f"🎵 Подготовлен фрагмент музыки: {fragment_path}")
+        except (OSError, subprocess.SubprocessError) as e:
+            logger.warning(f"Не удалось подготовить фрагмент музыки, используем исходный трек: {e}")
+            return music_path
+
+        self._music_fragments[key] = fragment_path
+        self._audio_codec_cache[fragment_path] = 'aac'
+        return fragment_path
+
+    def _audio_codec_args(self, music_path: str) -> List[str]:
+        """Параметры аудиокодека: AAC копируется без перекодирования, остальное кодируется в AAC"""
+        codec = self._audio_codec_cache.get(music_path)
+        if codec is None:
+            try:
+                codec = subprocess.run(
+                    ['ffprobe', '-v', 'error', '-select_streams', 'a:0',
+                     '-show_entries', 'stream=codec_name', '-of', 'csv=p=0', music_path],
+                    capture_output=True, text=True, timeout=10
+                ).stdout.strip()
+            except (OSError, subprocess.SubprocessError) as e:
+                logger.warning(f"Не удалось определить кодек музыки через ffprobe: {e}")
+                codec = ''
+            self._audio_codec_cache[music_path] = codec
+
+        if codec == 'aac':
+            return ['-c:a', 'copy']
+        return ['-c:a', 'aac', '-b:a', '128k']
+
+    @classmethod
+    def _detect_hw_encoder(cls) -> Optional[str]:
+        """Ищет рабочий аппаратный H.264 кодировщик ffmpeg"""
+        if cls._hw_encoder_checked:
+            return cls._hw_encoder
+        cls._hw_encoder_checked = True
+
+        try:
+            available = subprocess.run(
+                ['ffmpeg', '-hide_banner', '-encoders'],
+                capture_output=True, text=True, timeout=10
+            ).stdout
+        except (OSError, subprocess.SubprocessError) as e:
+            logger.warning(f"Не удалось получить список кодировщиков ffmpeg: {e}")
+            return None
 
-        for frame in frames:
-            video_writer.write(cv2.cvtColor(np.array(frame), cv2.COLOR_RGB2BGR))
+        for encoder, options in HW_VIDEO_ENCODERS.items():
+            if encoder not in available:
+                continue
+            # Кодировщик может быть в сборке ffmpeg без устройства или драйвера - проверяем коротким тестом
+            probe = [
+                'ffmpeg', '-hide_banner', '-loglevel', 'error',
+                '-f', 'lavfi', '-i', 'color=size=256x256:duration=0.1',
+                '-c:v', encoder, *options,
+                '-f', 'null', '-'
+            ]
+            try:
+                works = subprocess.run(probe, capture_output=True, timeout=20).returncode == 0
+            except (OSError, subprocess.SubprocessError):
+                works = False
+            if works:
+                logger.info(f"🚀 Используем аппаратный кодировщик видео: {encoder}")
+                cls._hw_encoder = encoder
+                return encoder
+
+        logger.info("Аппаратный кодировщик видео не найден, используем libx264")
+        return None
+
+    @staticmethod
+    def _finish_frame_encoder(encoder: subprocess.Popen):
+        """Закрывает stdin ffmpeg, дожидается окончания кодирования и проверяет код возврата"""
+        try:
+            encoder.stdin.close()
+        except BrokenPipeError:
+            pass  # ffmpeg уже завершился - причина будет в коде возврата и stderr
+        returncode = encoder.wait()
+        stderr_tail = encoder.stderr_drain.join()
+        if returncode != 0:
+            raise RuntimeError(f"ffmpeg завершился с кодом {returncode}: {stderr_tail}")
+
+    def _run_frame_encoder(self, encoder: subprocess.Popen,
+                           feed_frames: Callable[[Callable[[bytes], Any]], Any], output_path: str):
+        """Подает кадры в запущенный ffmpeg и дожидается окончания кодирования.
+
+        feed_frames получает функцию записи кадра (через FramePipeWriter). При любой ошибке
+        ffmpeg останавливается, а недописанный output_path удаляется.
+        """
+        writer = FramePipeWriter(encoder.stdin)
+        try:
+            try:
+                feed_frames(writer.write)
+                writer.close()
+            except BaseException:
+                encoder.kill()
+                writer.close()
+                self._abort_frame_encoder(encoder)
+                raise
+            self._finish_frame_encoder(encoder)
+        except BaseException:
+            self._remove_partial_output(output_path)
+            raise
 
-        video_writer.release()
-        return output_path
+    @staticmethod
+    def _remove_partial_output(output_path: str):
+        """Удаляет недописанный видеофайл после ошибки кодирования"""
+        try:
+            os.remove(output_path)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logger.warning(f"Не удалось удалить недописанное видео {output_path}: {e}")
+
+    @staticmethod
+    def _abort_frame_encoder(encoder: subprocess.Popen):
+        """Останавливает ffmpeg после ошибки захвата"""
+        encoder.kill()
+        encoder.wait()
+        encoder.stderr_drain.join()
     
     def _cleanup_temp_frames(self, video_path: str):
         pass
@@ -307,10 +773,14 @@ class VideoExporter:
             return None
 
     def close(self):
-        """Закрытие WebDriver"""
+        """Освобождение WebDriver: возврат в пул или закрытие, если пул заполнен"""
         if self.driver:
-            self.driver.quit()
-            logger.info("Selenium WebDriver закрыт")
+            driver, self.driver = self.driver, None
+            if self._release_driver(driver):
+                logger.info("Selenium WebDriver возвращен в пул")
+            else:
+                driver.quit()
+                logger.info("Selenium WebDriver закрыт")
 
     def __del__(self):
         """Деструктор для автоматического закрытия"""
@@ -325,13 +795,16 @@ class VideoExporter:
             
             temp_html_uri = Path(os.path.abspath(temp_html_path)).as_uri()
             self.driver.get(temp_html_uri)
-            time.sleep(3) # Wait for resources to load
+            self._wait_for_page_ready()
 
-            frames = self._capture_animation_frames()
             music_path = self._get_background_music()
-            fps = self.video_config.get('fps', 30)
+            fps = self.video_config.get('fps', 20)
+            # Точная длительность по числу кадров, которые снимет _capture_animation_frames
+            duration_seconds = int(self.video_config.get('duration_seconds', 6) * fps) / fps
 
-            self._export_frames_to_video_fallback(frames, output_path, fps, music_path)
+            # Кадры идут прямо в ffmpeg по мере захвата - список кадров в памяти не накапливается
+            encoder = self._start_frame_encoder(output_path, fps, music_path, duration_seconds=duration_seconds)
+            self._run_frame_encoder(encoder, self._capture_animation_frames, output_path)
 
             if os.path.exists(temp_html_path):
                 os.remove(temp_html_path)
@@ -345,14 +818,15 @@ class VideoExporter:
 
     def _create_news_short_html(self, video_package: Dict) -> Optional[str]:
         """Creates the HTML file for the news short, pre-processing video with ffmpeg if needed."""
+        trim_process = None
+        trimmed_video_path = None
         try:
             sandbox_enabled = self.video_config.get('sandbox_mode', {}).get('enabled', False)
             template_name = 'news_short_template_sandbox.html' if sandbox_enabled else 'news_short_template.html'
             logger.info(f"🔍 DEBUG Template selection: sandbox_enabled={sandbox_enabled}, template_name={template_name}")
             template_path = os.path.join(self.paths_config['templates_dir'], template_name)
 
-            with open(template_path, 'r', encoding='utf-8') as f:
-                template_content = f.read()
+            template_content = self._load_template(template_path)
             
             content = video_package.get('video_content', {})
             source_info = video_package.get('source_info', {})
@@ -374,27 +848,25 @@ class VideoExporter:
 
                     command = [
                         ffmpeg_path,
+                        '-noaccurate_seek',
+                        '-fflags', '+genpts',
                         '-ss', str(video_offset),
                         '-i', str(source_local_video_path),
                         '-t', '59',
+                        '-map', '0',
                         '-c', 'copy',
+                        '-avoid_negative_ts', 'make_zero',
+                        '-movflags', '+faststart',  # moov в начале файла: браузер начинает воспроизведение сразу
                         '-y',
                         str(trimmed_video_path)
                     ]
                     
                     logger.info(f"Executing ffmpeg command: {' '.join(command)}")
-                    result = subprocess.run(command, check=True, capture_output=True, text=True, encoding='utf-8', errors='ignore')
-                    logger.info("ffmpeg stdout: " + result.stdout)
-                    logger.warning("ffmpeg stderr: " + result.stderr)
+                    # Обрезка идет в фоне, пока собираются остальные подстановки шаблона
+                    trim_process = subprocess.Popen(command, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
 
-                    logger.info(f"Video successfully trimmed to {trimmed_video_path}")
-                    # Update the media dictionary to use the new local, trimmed video
-                    media['local_video_path'] = str(trimmed_video_path)
-
-                except (subprocess.CalledProcessError, FileNotFoundError) as e:
+                except FileNotFoundError as e:
                     logger.error(f"Failed to trim video with ffmpeg: {e}")
-                    if isinstance(e, subprocess.CalledProcessError):
-                        logger.error(f"FFMPEG Error Output: {e.stderr}")
                     # If trimming fails, try to use the original video anyway
                     media['local_video_path'] = source_local_video_path
             # --- END OF CORRECTED LOGIC ---
@@ -431,24 +903,30 @@ class VideoExporter:
                 if not path:
                     return ''
                 
-                if os.path.isabs(path) and ':' in path:
-                    try:
-                        temp_dir = Path("temp")
-                        temp_dir.mkdir(exist_ok=True)
-                        
-                        import shutil
-                        filename = Path(path).name
-                        local_path = temp_dir / filename
-                        shutil.copy2(path, local_path)
-                        
-                        logger.info(f"Copied temporary file: {path} -> {local_path}")
-                        return f"../{local_path.as_posix()}"
-                    except Exception as e:
-                        logger.error(f"Error copying file {path}: {e}")
-                        return ''
+                # Абсолютные пути отдаем браузеру как file:// URI - страница сама открыта
+                # из file://, поэтому копировать медиа в temp/ не нужно
+                if os.path.isabs(path):
+                    return Path(path).as_uri()
                 
                 return '../' + path.replace('\\', '/')
             
+            background_music = self._get_background_music()
+
+            if trim_process is not None:
+                _, trim_stderr = trim_process.communicate()
+                trim_stderr = trim_stderr.decode('utf-8', errors='ignore')
+                if trim_process.returncode == 0:
+                    if trim_stderr:
+                        logger.warning("ffmpeg stderr: " + trim_stderr)
+                    logger.info(f"Video successfully trimmed to {trimmed_video_path}")
+                    # Update the media dictionary to use the new local, trimmed video
+                    media['local_video_path'] = str(trimmed_video_path)
+                else:
+                    logger.error(f"Failed to trim video with ffmpeg: exit code {trim_process.returncode}")
+                    logger.error(f"FFMPEG Error Output: {trim_stderr}")
+                    # If trimming fails, try to use the original video anyway
+                    media['local_video_path'] = source_local_video_path
+
             news_image_path = ''
             news_video_path = ''
             
@@ -471,7 +949,7 @@ class VideoExporter:
                 '{{NEWS_TITLE}}': content.get('title', 'News Title'),
                 '{{NEWS_BRIEF}}': content.get('summary', 'News summary not available.'),
                 '{{PUBLISH_DATE}}': source_info.get('publish_date', 'Today'),
-                '{{BACKGROUND_MUSIC}}': self._get_background_music()
+                '{{BACKGROUND_MUSIC}}': background_music
             }
             
             logger.info(f"🔍 DEBUG Template replacements:")
@@ -480,9 +958,14 @@ class VideoExporter:
             logger.info(f"  TWITTER_AVATAR: {replacements['{{TWITTER_AVATAR}}']}")
             logger.info(f"  Media data: {media}")
             
-            html_content = template_content
-            for placeholder, value in replacements.items():
-                html_content = html_content.replace(placeholder, str(value or ''))
+            # Один проход по шаблону; неизвестные плейсхолдеры остаются как есть
+            def substitute(match):
+                placeholder = match.group(0)
+                if placeholder not in replacements:
+                    return placeholder
+                return str(replacements[placeholder] or '')
+
+            html_content = PLACEHOLDER_PATTERN.sub(substitute, template_content)
             
             temp_html_path = os.path.join(self.paths_config.get('temp_dir', 'temp'), f"news_short_{int(time.time())}.html")
             with open(temp_html_path, 'w', encoding='utf-8') as f:
@@ -493,6 +976,12 @@ class VideoExporter:
         except Exception as e:
             logger.error(f"Error creating HTML for short: {e}", exc_info=True)
             return None
+        finally:
+            # Обрезка не дождалась результата (ошибка до communicate) - останавливаем ffmpeg и убираем его файл
+            if trim_process is not None and trim_process.returncode is None:
+                trim_process.kill()
+                trim_process.communicate()
+                trimmed_video_path.unlink(missing_ok=True)
 
     def _extract_source_name(self, url: str) -> str:
         """Извлекает имя источника из URL"""
@@ -523,63 +1012,57 @@ class VideoExporter:
 
     def _get_source_logo_path(self, source_name: str) -> str:
         """
-        Получает путь к логотипу источника по имени
+        Получает путь к логотипу источника по имени (результат кэшируется по имени)
         """
         if not source_name:
             return ''
         
-        # Маппинг известных источников на их логотипы (только существующие файлы)
-        logo_mapping = {
-            'nbc news': 'resources/logos/NBCNews.png',
-            'nbcnews': 'resources/logos/NBCNews.png',
-            'abc news': 'resources/logos/abc.png',
-            'abcnews': 'resources/logos/abc.png',
-            'reuters': 'resources/logos/Reuters.png',
-            'cnn': 'resources/logos/cnn.png',
-            'fox news': 'resources/logos/FoxNews.png',
-            'foxnews': 'resources/logos/FoxNews.png',
-            'washington post': 'resources/logos/WashingtonPost.png',
-            'washingtonpost': 'resources/logos/WashingtonPost.png',
-            'wall street journal': 'resources/logos/WSJ.png',
-            'wsj': 'resources/logos/WSJ.png',
-            'cnbc': 'resources/logos/CNBC.png',
-            'al jazeera': 'resources/logos/ALJAZEERA.png',
-            'aljazeera': 'resources/logos/ALJAZEERA.png',
-            'associated press': 'resources/logos/AssociatedPress.png',
-            'ap': 'resources/logos/AssociatedPress.png',
-            'financial times': 'resources/logos/Financial_Times_corporate_logo_(no_background).svg',
-            'ft': 'resources/logos/Financial_Times_corporate_logo_(no_background).svg',
-            'the hill': 'resources/logos/thehill.png',
-            'thehill': 'resources/logos/thehill.png',
-            'politico': 'resources/logos/politico.png',
-        }
-        
+        logo_path = self._logo_path_cache.get(source_name)
+        if logo_path is None:
+            logo_path = self._find_source_logo_path(source_name)
+            self._logo_path_cache[source_name] = logo_path
+        return logo_path
+
+    @staticmethod
+    def _scan_logo_files() -> Dict[str, str]:
+        """Один проход os.scandir по каталогу логотипов"""
+        try:
+            with os.scandir(LOGOS_DIR) as entries:
+                return {entry.name.lower(): entry.name for entry in entries if entry.is_file()}
+        except OSError as e:
+            logger.warning(f"⚠️ Каталог логотипов недоступен: {LOGOS_DIR} ({e})")
+            return {}
+
+    def _find_source_logo_path(self, source_name: str) -> str:
+        """
+        Ищет логотип источника: точное и частичное совпадение по маппингу, затем по имени файла
+        """
         source_lower = source_name.lower().strip()
         
         # Проверяем точное совпадение
-        if source_lower in logo_mapping:
-            logo_path = logo_mapping[source_lower]
-            if Path(logo_path).exists():
-                logger.info(f"✅ Найден логотип для {source_name}: {logo_path}")
-                return logo_path
+        if source_lower in self._logo_index:
+            logo_path = self._logo_index[source_lower]
+            logger.info(f"✅ Найден логотип для {source_name}: {logo_path}")
+            return logo_path
         
         # Проверяем частичное совпадение
-        for key, logo_path in logo_mapping.items():
+        for key, logo_path in self._logo_index.items():
             if key in source_lower or source_lower in key:
-                if Path(logo_path).exists():
-                    logger.info(f"✅ Найден логотип для {source_name} (частичное совпадение): {logo_path}")
-                    return logo_path
+                logger.info(f"✅ Найден логотип для {source_name} (частичное совпадение): {logo_path}")
+                return logo_path
         
         # Пробуем найти файл по шаблону
         potential_paths = [
-            f"resources/logos/{source_name}.png",
-            f"resources/logos/{source_name.replace(' ', '')}.png",
-            f"resources/logos/{source_name.upper()}.png",
-            f"resources/logos/{source_name.lower().replace(' ', '')}.png",
+            f"{LOGOS_DIR}/{source_name}.png",
+            f"{LOGOS_DIR}/{source_name.replace(' ', '')}.png",
+            f"{LOGOS_DIR}/{source_name.upper()}.png",
+            f"{LOGOS_DIR}/{source_name.lower().replace(' ', '')}.png",
         ]
         
         for path in potential_paths:
-            if Path(path).exists():
+            file_name = self._logo_files.get(os.path.basename(path).lower())
+            if file_name:
+                path = f"{LOGOS_DIR}/{file_name}"
                 logger.info(f"✅ Найден логотип для {source_name}: {path}")
                 return path
         
@@ -672,107 +1155,130 @@ class VideoExporter:
         return ""
 
     def _get_background_music(self) -> str:
-        """Получает путь к фоновой музыке"""
-        try:
-            from scripts.media_manager import MediaManager
-            config_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'config', 'config.yaml')
-            with open(config_path, 'r', encoding='utf-8') as f:
-                config = yaml.safe_load(f)
-            media_manager = MediaManager(config)
-            music_path = media_manager.get_background_music()
-            
-            if music_path:
-                return f"../{music_path}"
-            else:
-                return ""
-                
-        except Exception as e:
-            logger.warning(f"Ошибка получения фоновой музыки через MediaManager: {e}")
-            
-            # Fallback к старому методу
-            music_dir = "resources/music"
-            
-            if not os.path.exists(music_dir):
-                logger.info(f"Папка с музыкой не найдена: {music_dir}")
-                return ""
-                
-            audio_extensions = ['.mp3', '.wav', '.ogg', '.m4a']
-            
-            # Собираем все аудиофайлы
-            music_files = []
-            for file in os.listdir(music_dir):
-                if any(file.lower().endswith(ext) for ext in audio_extensions):
-                    music_files.append(file)
-            
-            if music_files:
-                # Выбираем случайный файл
-                import random
-                selected_file = random.choice(music_files)
-                music_path = os.path.join(music_dir, selected_file)
-                logger.info(f"Найдена фоновая музыка: {selected_file}")
-                return f"../{music_path}"
-                    
-            logger.info("Фоновая музыка не найдена в папке resources/music")
+        """Получает путь к фоновой музыке: случайный трек из закэшированного списка"""
+        if self._music_files is None:
+            self._music_files = self._scan_music_files()
+
+        if not self._music_files:
             return ""
 
-    def _export_frames_to_video_fallback(self, frames: List[np.ndarray], output_path: str, fps: int, music_path: Optional[str] = None):
-        """Резервный метод экспорта кадров в видео с помощью OpenCV и FFMPEG для аудио"""
-        if not frames:
+        # Выбираем случайный файл
+        music_path = random.choice(self._music_files)
+        logger.info(f"Найдена фоновая музыка: {os.path.basename(music_path)}")
+        return f"../{music_path}"
+
+    def refresh_music_cache(self):
+        """Сбрасывает список треков - следующий вызов заново просканирует папку с музыкой"""
+        self._music_files = None
+
+    @staticmethod
+    def _scan_music_files() -> List[str]:
+        """Собирает аудиофайлы из папки с музыкой за один проход os.scandir"""
+        try:
+            with os.scandir(MUSIC_DIR) as entries:
+                music_files = [
+                    entry.path for entry in entries
+                    if entry.is_file() and entry.name.lower().endswith(AUDIO_EXTENSIONS)
+                ]
+        except FileNotFoundError:
+            logger.info(f"Папка с музыкой не найдена: {MUSIC_DIR}")
+            return []
+
+        if not music_files:
+            logger.info(f"Фоновая музыка не найдена в папке {MUSIC_DIR}")
+        return music_files
+
+    def _export_frames_to_video_fallback(self, frames: Iterable[np.ndarray], output_path: str, fps: int,
+                                         music_path: Optional[str] = None, duration_seconds: Optional[float] = None):
+        """Резервный метод экспорта кадров в видео: сырые кадры идут в один процесс FFMPEG вместе с аудио.
+
+        frames может быть генератором - кадры кодируются по мере поступления и не копятся в памяти.
+        """
+        frames = iter(frames)
+        first_frame = next(frames, None)
+        if first_frame is None:
             logger.error("Нет кадров для экспорта в видео.")
             return
+        frames = itertools.chain([first_frame], frames)
+
+        height, width, layers = first_frame.shape
+        # Кадры переводятся в yuv420p здесь же (cv2, SIMD): в канал идет 1.5 байта на пиксель вместо 3,
+        # а ffmpeg не тратит время на swscale. yuv420p требует четных размеров - иначе отдаем BGR как есть
+        color_conversion = None
+        pix_fmt = 'bgra' if layers == 4 else 'bgr24'
+        if width % 2 == 0 and height % 2 == 0:
+            color_conversion = cv2.COLOR_BGRA2YUV_I420 if layers == 4 else cv2.COLOR_BGR2YUV_I420
+            pix_fmt = 'yuv420p'
+        input_args = [
+            '-f', 'rawvideo',
+            '-pix_fmt', pix_fmt,
+            '-s', f'{width}x{height}'
+        ]
 
-        height, width, layers = frames[0].shape
-        fourcc = cv2.VideoWriter_fourcc(*'mp4v')
-        
-        # Если есть музыка, сначала создаем видео без звука
-        silent_video_path = output_path
-        if music_path and os.path.exists(music_path.replace('../', '')):
-            silent_video_path = os.path.join(os.path.dirname(output_path), f"silent_{os.path.basename(output_path)}")
-
-        video = cv2.VideoWriter(silent_video_path, fourcc, fps, (width, height))
-        for frame in frames:
-            video.write(cv2.cvtColor(frame, cv2.COLOR_RGB2BGR))
+        try:
+            encoder = self._start_frame_encoder(output_path, fps, music_path, input_args, duration_seconds)
+        except FileNotFoundError:
+            logger.error("❌ FFMPEG не найден. Убедитесь, что он установлен и доступен в PATH.")
+            # Без FFMPEG пишем видео без звука средствами OpenCV
+            self._write_frames_with_opencv(frames, output_path, fps)
+            return
+
+        # Кольцо заранее выделенных буферов yuv420p вместо нового массива на каждый кадр. Буфер
+        # заполняется снова не раньше, чем его запишет поток writer: в очереди не больше
+        # FRAME_QUEUE_SIZE кадров, еще один пишется и один заполняется
+        yuv_buffers = []
+        if color_conversion is not None:
+            yuv_buffers = [np.empty((height * 3 // 2, width), dtype=np.uint8) for _ in range(FRAME_QUEUE_SIZE + 2)]
+
+        def feed_frames(write_frame: Callable[[bytes], Any]):
+            for index, frame in enumerate(frames):
+                if color_conversion is not None:
+                    frame = cv2.cvtColor(frame, color_conversion, dst=yuv_buffers[index % len(yuv_buffers)])
+                write_frame(np.ascontiguousarray(frame).data)
+
+        self._run_frame_encoder(encoder, feed_frames, output_path)
+        logger.info(f"✅ Видео закодировано: '{output_path}'")
+
+    @staticmethod
+    def _write_frames_with_opencv(frames: Iterable[np.ndarray], output_path: str, fps: int):
+        """Запись кадров BGR в mp4 без звука через cv2.VideoWriter (если FFMPEG недоступен)"""
+        frames = iter(frames)
+        first_frame = next(frames)
+        frames = itertools.chain([first_frame], frames)
+        height, width = first_frame.shape[:2]
+        video = cv2.VideoWriter(output_path, cv2.VideoWriter_fourcc(*'mp4v'), fps, (width, height))
+        try:
+            # Кадры уже в BGR - конвертация цвета не нужна
+            for frame in frames:
+                video.write(frame)
+        except BaseException:
+            video.release()
+            VideoExporter._remove_partial_output(output_path)
+            raise
         video.release()
+        logger.info(f"Видео без звука создано: {output_path}")
+        
+    def _iter_page_frames(self, num_frames: int) -> Iterator[np.ndarray]:
+        """Генератор кадров страницы (BGR): скриншот снимается, когда кодировщик готов принять кадр.
 
-        logger.info(f"Видео без звука создано: {silent_video_path}")
-
-        # Добавляем аудио дорожку с помощью FFMPEG
-        actual_music_path = music_path.replace('../', '')
-        if music_path and os.path.exists(actual_music_path):
-            logger.info(f"🎵 Добавляем аудиодорожку '{actual_music_path}' с помощью FFMPEG...")
-            command = [
-                'ffmpeg',
-                '-y',  # Перезаписывать выходной файл без запроса
-                '-i', silent_video_path,
-                '-i', actual_music_path,
-                '-c:v', 'copy',  # Копировать видеопоток без перекодирования
-                '-c:a', 'aac',   # Кодировать аудио в AAC
-                '-shortest',     # Длительность видео будет равна самому короткому потоку
-                '-loglevel', 'error', # Скрыть лишние логи
-                output_path
-            ]
+        Скриншот берется через DevTools в JPEG - это заметно дешевле PNG и в браузере, и при
+        декодировании; cv2.imdecode сразу отдает BGR-массив.
+        """
+        for i in range(num_frames):
+            screenshot_data = self.driver.execute_cdp_cmd(
+                "Page.captureScreenshot",
+                {"format": "jpeg", "quality": 90, "optimizeForSpeed": True}
+            )
+            jpeg_bytes = b64decode(screenshot_data['data'])
+            frame = cv2.imdecode(np.frombuffer(jpeg_bytes, np.uint8), cv2.IMREAD_COLOR)
+            if frame is None:
+                raise ValueError("cv2.imdecode вернул None")
+            yield frame
             
-            try:
-                subprocess.run(command, check=True, capture_output=True, text=True)
-                logger.info(f"✅ Аудиодорожка успешно добавлена в '{output_path}'")
-                # Удаляем временное видео без звука
-                os.remove(silent_video_path)
-            except FileNotFoundError:
-                logger.error("❌ FFMPEG не найден. Убедитесь, что он установлен и доступен в PATH.")
-                # Если FFMPEG нет, оставляем видео без звука
-                if silent_video_path != output_path:
-                    os.rename(silent_video_path, output_path)
-            except subprocess.CalledProcessError as e:
-                logger.error(f"❌ Ошибка FFMPEG при добавлении аудио: {e.stderr}")
-                # Если FFMPEG выдал ошибку, оставляем видео без звука
-                if silent_video_path != output_path:
-                    os.rename(silent_video_path, output_path)
-        else:
-            if not music_path:
-                logger.info("🎶 Музыка не выбрана, видео будет без звука.")
-            else:
-                logger.warning(f"⚠️ Файл музыки не найден: '{actual_music_path}', видео будет без звука.")
-        
+            # Задержка между кадрами не нужна, т.к. анимации теперь внутри видео
+
+        logger.info(f"Захвачено {num_frames} кадров.")
+
     def create_short_from_html(self, news_data: Dict) -> Optional[str]:
         """Создает видео-шорт из HTML-шаблона, полагаясь на пред-обработанное видео."""
         try:
@@ -782,32 +1288,23 @@ class VideoExporter:
                 return None
 
             self.driver.get(f"file:///{os.path.abspath(temp_html_path)}")
-            
-            # Даем странице время на полную загрузку всех ресурсов (шрифты, изображения)
-            time.sleep(3) 
+            self._wait_for_page_ready()
 
-            frames = []
             duration_seconds = self.video_config.get('duration_seconds', 59)
             fps = self.video_config.get('fps', 30)
             num_frames = int(duration_seconds * fps)
             
             logger.info(f"Захватываем {num_frames} кадров за {duration_seconds} секунд с FPS {fps}")
 
-            for i in range(num_frames):
-                screenshot = self.driver.get_screenshot_as_png()
-                img = Image.open(io.BytesIO(screenshot))
-                frames.append(np.array(img))
-                
-                # Задержка между кадрами не нужна, т.к. анимации теперь внутри видео
-
-            logger.info(f"Захвачено {len(frames)} кадров.")
-            
             output_filename = f"short_{news_data.get('id', 'temp')}_{int(time.time())}.mp4"
             output_path = os.path.join(self.paths_config.get('outputs_dir', 'outputs'), output_filename)
 
             music_path = self._get_background_music()
 
-            self._export_frames_to_video_fallback(frames, output_path, fps, music_path)
+            # Кадры снимаются по одному и сразу уходят в кодировщик
+            self._export_frames_to_video_fallback(
+                self._iter_page_frames(num_frames), output_path, fps, music_path, num_frames / fps
+            )
 
             os.remove(temp_html_path)
             logger.info(f"News short видео создано: {output_path}")
@@ -818,6 +1315,9 @@ class VideoExporter:
             return None
 
 
+atexit.register(VideoExporter.shutdown_driver_pool)
+
+
 def main():
     """Тестовая функция"""
     config_path = os.path.join(os.path.dirname(__file__), '..', 'config', 'config.yaml')